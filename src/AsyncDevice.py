@@ -0,0 +1,238 @@
+import asyncio
+from collections import deque, namedtuple
+from Device import parseResponse, responseError
+from Document import *
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+PlotEvent = namedtuple('PlotEvent', ['state', 'progress', 'index', 'message'])
+
+class DeviceProtocol(asyncio.Protocol):
+    def __init__(self, device):
+        self.device = device
+        self.buf = b''
+
+    def connection_made(self, transport):
+        self.device.transport = transport
+
+    def data_received(self, data):
+        self.buf += data
+        while b'\n' in self.buf:
+            line, self.buf = self.buf.split(b'\n', 1)
+            self.device.dispatch(line.decode(errors='replace').strip())
+
+    def connection_lost(self, exc):
+        self.device.connectionLost(exc)
+
+class AsyncDevice:
+    def __init__(self, window=4, timeout=5.0):
+        self.window=max(1,window)
+        self.timeout=timeout
+        self.transport=None
+        self.connected=False
+        self.seq=0
+        self.pending={}
+        self.reports=deque(maxlen=100)
+        self.reportCallback=None
+        self.limitSwitch=False
+        self.progress=0.0
+        self.running=False
+        self.resumed=asyncio.Event()
+        self.resumed.set()
+        self.task=None
+
+    @classmethod
+    async def open(cls, port, window=4, timeout=5.0):
+        if serial_asyncio is None:
+            raise RuntimeError('AsyncDevice requires the pyserial-asyncio package')
+        dev=cls(window, timeout)
+        loop=asyncio.get_running_loop()
+        await serial_asyncio.create_serial_connection(loop, lambda: DeviceProtocol(dev), port, baudrate=115200)
+        await asyncio.sleep(1.0)
+        dev.connected = (await dev.command('M17'))=='ok'
+        if dev.connected:
+            await dev.park()
+        return dev
+
+    def dispatch(self, line):
+        if not line:
+            return
+        seq, out = parseResponse(line)
+        future=self.pending.pop(seq, None)
+        if future:
+            if not future.done():
+                future.set_result(out)
+        else:
+            self.report(line)
+
+    def report(self, line):
+        if line.startswith('@6'):
+            self.limitSwitch = line.split()[-1]=='V1'
+        self.reports.append(line)
+        if self.reportCallback:
+            self.reportCallback(line)
+        else:
+            print(line)
+
+    def connectionLost(self, exc):
+        self.connected=False
+        pending=self.pending
+        self.pending={}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Device disconnected'))
+
+    def send(self, cmd):
+        future=asyncio.get_running_loop().create_future()
+        if not self.transport or self.transport.is_closing():
+            future.set_exception(ConnectionError('Device disconnected'))
+            return future
+        self.seq = self.seq%9999+1
+        self.pending[self.seq]=future
+        self.transport.write(('#%d %s\n'%(self.seq, cmd)).encode())
+        return future
+
+    async def command(self, cmd):
+        future=self.send(cmd)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            print('No response to: '+cmd)
+        except ConnectionError as e:
+            print(e)
+        return ''
+
+    async def plot(self, g):
+        self.progress=0.0
+        self.running=True
+        self.resumed.set()
+        n=max(len(g),1)
+        commands=iter(g)
+        last=None
+        sent=0
+        num=0
+        inflight=deque()
+        try:
+            await self.command('M204 P900 T900 R900')
+            while True:
+                if not self.resumed.is_set():
+                    failed=None
+                    while inflight:
+                        future, i, cmd = inflight.popleft()
+                        err=responseError(await future)
+                        if err=='E22':
+                            if failed is None:
+                                failed=(i, cmd)
+                        elif err:
+                            yield PlotEvent('warning', self.progress, i, 'Command failed with %s:\n'%err+cmd)
+                    if failed:
+                        yield PlotEvent('error', self.progress, failed[0], 'Position is unreachable:\n'+failed[1])
+                        await self.command(gCodeMove(160,0,100, 1000))
+                        return
+                    num=sent
+                    self.progress = float(num)/float(n)*100.0
+                    if last:
+                        await self.command('G0'+last[2:])
+                    yield PlotEvent('paused', self.progress, num, None)
+                    await self.resumed.wait()
+                    yield PlotEvent('resumed', self.progress, num, None)
+                    continue
+                while len(inflight)<self.window:
+                    cmd=next(commands, None)
+                    if cmd is None:
+                        break
+                    inflight.append((self.send(cmd), sent, cmd))
+                    sent=sent+1
+                    if cmd[0:3] in ('G0 ', 'G1 '):
+                        last=cmd
+                if not inflight:
+                    break
+                future, i, cmd = inflight.popleft()
+                err=responseError(await future)
+                if err=='E22':
+                    yield PlotEvent('error', self.progress, i, 'Position is unreachable:\n'+cmd)
+                    for future, i, cmd in inflight:
+                        await future
+                    await self.command(gCodeMove(160,0,100, 1000))
+                    return
+                elif err:
+                    yield PlotEvent('warning', self.progress, i, 'Command failed with %s:\n'%err+cmd)
+                num=num+1
+                self.progress = min(float(num)/float(n)*100.0, 100.0)
+                yield PlotEvent('progress', self.progress, num, None)
+            await self.park()
+            yield PlotEvent('done', self.progress, num, None)
+        except asyncio.CancelledError:
+            await asyncio.shield(self.command(gCodeMove(160,0,100, 1000)))
+            raise
+        finally:
+            self.running=False
+
+    def startPlot(self, g, callback=None):
+        async def run():
+            async for event in self.plot(g):
+                if callback:
+                    callback(event)
+        self.task=asyncio.ensure_future(run())
+        return self.task
+
+    def pause(self):
+        self.resumed.clear()
+
+    def resume(self):
+        self.resumed.set()
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def isConnected(self):
+        return self.connected
+
+    async def disconnect(self):
+        self.stop()
+        await self.park()
+        self.transport.close()
+        self.connected=False
+
+    async def engage(self):
+        return await self.command('M17')
+
+    async def disengage(self):
+        return await self.command('M2019')
+
+    async def getDeviceName(self):
+        out = await self.command('P2201')
+        return out[3:]
+
+    async def getHWVersion(self):
+        out = await self.command('P2202')
+        return out[3:]
+
+    async def getSWVersion(self):
+        out = await self.command('P2203')
+        return out[3:]
+
+    async def getAPIVersion(self):
+        out = await self.command('P2204')
+        return out[3:]
+
+    async def getMode(self):
+        out = await self.command('P2400')
+        return int(out[4:5])
+
+    async def setMode(self, mode=1):
+        if mode>=0 and mode<=3:
+            await self.command('M2400 S%d'%mode)
+        else:
+            print('Invalid mode '+str(mode))
+
+    async def setServo(self, val):
+        if val>=0 and val<=180:
+            return await self.command('G2202 N3 V%0.2f'%val)
+
+    async def park(self):
+        await self.command('G2201 S%0.2f R%0.2f H%0.2f F%0.2f'%(140,90.0,80,10000))
@@ -35,8 +35,13 @@ class CommandDialog(QtWidgets.QDialog):
                 self.device.setMode(1)
             else:
                 self.device.setMode(3)
-            self.doc.updateGcode()    
-            self.device.startPlot(self.doc.gcode,self.stopCallback)
+            g=self.doc.gcodeStream()
+            try:
+                len(g)
+            except ValueError as e:
+                QtWidgets.QMessageBox.warning(self, 'Invalid coordinates', str(e))
+                return
+            self.device.startPlot(g,self.stopCallback)
         else:
             self.device.pause=False
         self.pushStart.setEnabled(False)
@@ -2,6 +2,8 @@ import serial
 from serial.tools.list_ports import comports as list_ports
 from serial.serialutil import SerialException
 from time import sleep
+from collections import deque
+from concurrent.futures import Future, TimeoutError
 import threading
 from Document import *
 
@@ -11,26 +13,86 @@ def listDevices():
         ret.append(p.device)
     return ret
 
+def parseResponse(line):
+    if line.startswith('$'):
+        seq, _, body = line[1:].partition(' ')
+        if seq.isdigit():
+            return int(seq), body
+    return None, line
+
+def responseError(out):
+    for tok in out.split():
+        if len(tok)>1 and tok[0]=='E' and tok[1:].isdigit():
+            return tok
+    return None
+
 class Device:
-    def __init__(self, port):
+    def __init__(self, port, window=4, timeout=5.0):
         self.progress=0.0
         self.pause=False
         self.stop=False
         self.running=False
+        self.error=None
+        self.window=max(1,window)
+        self.timeout=timeout
+        self.seq=0
+        self.pending={}
+        self.lock=threading.Lock()
+        self.reports=deque(maxlen=100)
+        self.reportCallback=None
+        self.limitSwitch=False
+        self.reading=False
         try:
-            self.ser = serial.Serial(port, baudrate=115200)
+            self.ser = serial.Serial(port, baudrate=115200, timeout=0.1)
             sleep(1.0)
-            self.readall()
+            self.reading=True
+            self.reader=threading.Thread(target=self.readLoop, daemon=True)
+            self.reader.start()
             ret=self.command('M17')=='ok'
             self.connected = ret
-            self.readall()
-            self.park()
+            if self.connected:
+                self.park()
+            else:
+                self.close()
         except serial.serialutil.SerialException:
             self.connected = False
 
-    def readall(self):
-        while self.ser.inWaiting()>0:
-            print(self.ser.readline().decode().strip())
+    def readLoop(self):
+        buf=b''
+        while self.reading:
+            try:
+                buf+=self.ser.read(max(1,self.ser.inWaiting()))
+            except (SerialException, OSError, TypeError):
+                break
+            while b'\n' in buf:
+                line, buf = buf.split(b'\n',1)
+                self.dispatch(line.decode(errors='replace').strip())
+        self.reading=False
+        with self.lock:
+            pending=self.pending
+            self.pending={}
+        for future in pending.values():
+            future.set_exception(SerialException('Device disconnected'))
+
+    def dispatch(self, line):
+        if not line:
+            return
+        seq, out = parseResponse(line)
+        with self.lock:
+            future=self.pending.pop(seq, None)
+        if future:
+            future.set_result(out)
+        else:
+            self.report(line)
+
+    def report(self, line):
+        if line.startswith('@6'):
+            self.limitSwitch = line.split()[-1]=='V1'
+        self.reports.append(line)
+        if self.reportCallback:
+            self.reportCallback(line)
+        else:
+            print(line)
 
     def startPlot(self, g, callback):
         t=threading.Thread( target = self.plot, args = (g, callback, ) )
@@ -41,40 +103,116 @@ class Device:
         self.pause=False
         self.stop=False
         self.running=True
-        num=0
-        self.ser.flushInput()
+        self.error=None
         self.command('M204 P900 T900 R900')
-        for i in range(0,len(g)):
-            if self.stop:
-                self.command(gCodeMove(160,0,100, 1000))
-                self.running=False
-                callback()
-                return
-            if self.pause:
-                cmd='G0'+g[max(i-1,0)][2:]
-                self.command(cmd)
+        try:
+            n=max(len(g),1)
+            commands=iter(g)
+        except Exception as e:
+            self.generateError(e, callback)
+            return
+        last=None
+        sent=0
+        num=0
+        inflight=deque()
+        while True:
+            if self.stop or self.pause:
+                if not self.drain(inflight):
+                    self.abort(callback)
+                    return
+                num=sent
+                self.progress = float(num)/float(n)*100.0
+                if self.stop:
+                    self.abort(callback)
+                    return
+                if last:
+                    self.command('G0'+last[2:])
                 while self.pause and not self.stop:
                     sleep(0.5)
-            out = self.command(g[i])
-            if(out[3:6]=='E22'):
-                print('Position is unreachable:\n'+g[i].decode())
-                print('Aborting...')
-                out = self.command(gCodeMove(160,0,100, 1000))
-                self.running=False
-                callback()
+                continue
+            while len(inflight)<self.window:
+                try:
+                    cmd=next(commands, None)
+                except Exception as e:
+                    self.drain(inflight)
+                    self.generateError(e, callback)
+                    return
+                if cmd is None:
+                    break
+                inflight.append((self.send(cmd), cmd))
+                sent=sent+1
+                if cmd[0:3] in ('G0 ', 'G1 '):
+                    last=cmd
+            if not inflight:
+                break
+            if not self.ack(inflight.popleft()):
+                self.drain(inflight)
+                self.abort(callback)
                 return
             num=num+1
-            self.progress = float(num)/float(len(g))*100.0
+            self.progress = min(float(num)/float(n)*100.0, 100.0)
         self.running=False
         self.stop=True
         self.park()
         callback()
 
+    def send(self, cmd):
+        future=Future()
+        with self.lock:
+            self.seq = self.seq%9999+1
+            self.pending[self.seq]=future
+            try:
+                self.ser.write(('#%d %s\n'%(self.seq, cmd)).encode())
+            except (SerialException, OSError) as e:
+                del self.pending[self.seq]
+                future.set_exception(e)
+        return future
+
+    def ack(self, pending):
+        future, cmd = pending
+        try:
+            out=future.result()
+        except (SerialException, OSError) as e:
+            self.error='Lost connection while sending:\n'+cmd
+            print(self.error)
+            print(e)
+            return False
+        err=responseError(out)
+        if err=='E22':
+            self.error='Position is unreachable:\n'+cmd
+            print(self.error)
+            print('Aborting...')
+            return False
+        elif err:
+            print('Command failed with %s:\n'%err+cmd)
+        return True
+
+    def drain(self, inflight):
+        ret=True
+        while inflight:
+            ret=self.ack(inflight.popleft()) and ret
+        return ret
+
+    def generateError(self, e, callback):
+        self.error='Failed to generate G-code:\n'+str(e)
+        print(self.error)
+        self.abort(callback)
+
+    def abort(self, callback):
+        self.command(gCodeMove(160,0,100, 1000))
+        self.running=False
+        callback()
+
     def isConnected(self):
         return self.connected
 
     def disconnect(self):
         self.park()
+        self.close()
+
+    def close(self):
+        self.reading=False
+        self.reader.join()
         self.ser.close()
         self.connected = False
 
@@ -102,7 +240,7 @@ class Device:
 
     def getMode(self):
         out = self.command('P2400')
-        return int(out.decode()[4:5])
+        return int(out[4:5])
 
     def setMode(self, mode=1):
         if mode>=0 and mode<=3:
@@ -111,9 +249,18 @@ class Device:
             print('Invalid mode '+str(mode))
 
     def command(self, cmd):
-        self.ser.flushInput()
-        self.ser.write((cmd+'\n').encode())
-        return self.ser.readline().decode().strip()
+        future=self.send(cmd)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            with self.lock:
+                for seq, f in list(self.pending.items()):
+                    if f is future:
+                        del self.pending[seq]
+            print('No response to: '+cmd)
+        except (SerialException, OSError) as e:
+            print(e)
+        return ''
 
     def setServo(self, val):
         if val>=0 and val<=180:
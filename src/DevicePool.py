@@ -0,0 +1,136 @@
+import threading
+import queue
+from time import time, sleep
+from Device import *
+
+class Job:
+    def __init__(self, doc, name=''):
+        self.doc=doc
+        self.name=name if name else doc.filename
+        self.state='queued'
+        self.error=None
+        self.port=None
+        self.device=None
+        self.started=None
+        self.finished=None
+        self.done=0.0
+
+    @property
+    def progress(self):
+        if self.state=='running' and self.device:
+            return self.device.progress
+        return self.done
+
+    def cancel(self):
+        if self.state=='running' and self.device:
+            self.device.stop=True
+        if self.state in ('queued', 'running'):
+            self.state='cancelled'
+
+class DevicePool:
+    def __init__(self, ports=None, deviceFactory=Device):
+        if ports is None:
+            ports=listDevices()
+        self.deviceFactory=deviceFactory
+        self.devices={}
+        self.jobs=[]
+        self.queue=queue.Queue()
+        self.lock=threading.Lock()
+        self.gcodeLock=threading.Lock()
+        self.started=None
+        self.workers=[]
+        self.live=len(ports)
+        for port in ports:
+            t=threading.Thread(target=self.worker, args=(port, ), daemon=True)
+            t.start()
+            self.workers.append(t)
+
+    def worker(self, port):
+        try:
+            dev=self.deviceFactory(port)
+            if not dev.isConnected():
+                return
+            with self.lock:
+                self.devices[port]=dev
+            while True:
+                job=self.queue.get()
+                if job is None:
+                    break
+                if job.state=='cancelled':
+                    continue
+                self.run(job, port, dev)
+            dev.disconnect()
+        finally:
+            with self.lock:
+                self.live-=1
+            self.failQueued()
+
+    def failQueued(self):
+        with self.lock:
+            if self.live>0:
+                return
+            for job in self.jobs:
+                if job.state=='queued':
+                    job.error='No device available'
+                    job.state='failed'
+
+    def run(self, job, port, dev):
+        with self.lock:
+            if self.started is None:
+                self.started=time()
+        job.port=port
+        job.device=dev
+        job.started=time()
+        job.state='running'
+        plotted=False
+        try:
+            g=job.doc.gcodeStream(lock=self.gcodeLock)
+            with self.gcodeLock:
+                len(g)
+            if job.doc.mode == 1:
+                dev.setMode(1)
+            else:
+                dev.setMode(3)
+            if job.state=='running':
+                plotted=True
+                dev.plot(g, lambda: None)
+                job.error=dev.error
+        except Exception as e:
+            job.error=str(e)
+        job.done=dev.progress if plotted else 0.0
+        job.finished=time()
+        job.device=None
+        if job.error:
+            job.state='failed'
+        elif job.state=='running':
+            job.state='done'
+            job.done=100.0
+
+    def submit(self, doc, name=''):
+        job=Job(doc, name)
+        with self.lock:
+            self.jobs.append(job)
+        self.queue.put(job)
+        self.failQueued()
+        return job
+
+    def idle(self):
+        return all(job.state not in ('queued', 'running') for job in self.jobs)
+
+    def wait(self, interval=0.1):
+        while not self.idle():
+            sleep(interval)
+
+    def jobsPerHour(self):
+        finished=[job.finished for job in self.jobs if job.state=='done']
+        if not finished or self.started is None:
+            return 0.0
+        return len(finished)/max(max(finished)-self.started, 1e-9)*3600.0
+
+    def shutdown(self):
+        for job in self.jobs:
+            job.cancel()
+        for t in self.workers:
+            self.queue.put(None)
+        for t in self.workers:
+            t.join()
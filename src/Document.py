@@ -1,43 +1,96 @@
-import math
+import os
+import copy
 import pickle
+import itertools
+import threading
 import numpy as np
 
 from DocumentObject import *
+from SpatialIndex import *
+from PathOptimizer import optimizePath, travel
+from ImportCache import *
+from UarmFile import *
 
-def distance(A, B):
-    return math.sqrt(math.pow(A[0]-B[0],2) + math.pow(A[1]-B[1],2))
-
-def length(segs):
-    d=0.0
-    for i in range(1,len(segs)):
-        d=d+distance(segs[i-1], segs[i])
-    return d
-
-def maxLen(segs):
-    imax=0
-    dmax=0.0
-    for i in range(len(segs)):
-        d=length(segs[i])
-        if d>dmax:
-            dmax=d
-            imax=i
-    return imax
+def lengths(segs):
+    return segLengths(*packSegs(segs))
+
+def segLengths(pts, starts, counts):
+    d=np.zeros(len(pts))
+    if len(pts)>1:
+        two=np.full(len(pts)-1, 2.0)
+        d[1:]=np.sqrt(np.float_power(pts[:-1,0]-pts[1:,0], two)+np.float_power(pts[:-1,1]-pts[1:,1], two))
+    d[starts]=0.0
+    ret=np.zeros(len(counts))
+    bucket=np.ceil(np.log2(np.maximum(counts,1))).astype(int)
+    for b in np.unique(bucket):
+        idx=np.flatnonzero(bucket==b)
+        rows=np.repeat(np.arange(len(idx)), counts[idx])
+        cols=np.arange(len(rows))-np.repeat(np.cumsum(counts[idx])-counts[idx], counts[idx])
+        M=np.zeros((len(idx), counts[idx].max()))
+        M[rows,cols]=d[np.repeat(starts[idx], counts[idx])+cols]
+        ret[idx]=np.add.accumulate(M, axis=1)[:,-1]
+    return ret
 
 def checkCoords(x,y,z):
-    if x<132.0 or x>300.0 or y<-200.0 or y>200.0 or z<-100.0:
-        return False
-    return True
+    return (x>=132.0) & (x<=300.0) & (y>=-200.0) & (y<=200.0) & (z>=-100.0)
+
+MOVE='G0 X%.2f Y%.2f Z%.2f F%.2f'
+BURN='G1 X%.2f Y%.2f Z%.2f F%.2f'
 
 def gCodeMove(x,y,z,F):
-    return 'G0 X%.2f Y%.2f Z%.2f F%.2f'%(x, y, z, F)
+    return MOVE%(x, y, z, F)
 
 def gCodeBurn(x,y,z,F):
-    return 'G1 X%.2f Y%.2f Z%.2f F%.2f'%(x, y, z, F)
+    return BURN%(x, y, z, F)
 
 def gCodeDelay(t):
     return 'G2004 X%.2f'%(t,)
 
+def packSegs(segs):
+    counts=np.array([len(seg) for seg in segs], dtype=int)
+    if len(segs)==0:
+        return np.zeros((0,2)), counts, counts
+    pts=np.concatenate([np.asarray(seg, dtype=float).reshape(-1,2) for seg in segs])
+    starts=np.cumsum(counts)-counts
+    return pts, starts, counts
+
+def gcodeTemplate(fmt, z, F):
+    return fmt.replace('Z%.2f F%.2f', 'Z%.2f F%.2f'%(z, F))
+
+def formatLines(templates, values):
+    return ('\n'.join(templates)%tuple(values.ravel().tolist())).split('\n')
+
+class InvalidCoordinatesError(ValueError):
+    def __init__(self, points):
+        self.points=points
+        msg='Invalid coordinates at %d points:'%len(points)
+        for p in points[:10]:
+            msg+='\n  segment %d, point %d: (%f, %f, %f)'%p
+        if len(points)>10:
+            msg+='\n  ...'
+        ValueError.__init__(self, msg)
+
+class GcodeStream:
+    def __init__(self, doc, order=0, lock=None):
+        self.doc=doc
+        self.order=order
+        self.lock=lock if lock else threading.Lock()
+        self.segs=None
+        self.total=None
+
+    def __len__(self):
+        if self.total is None:
+            self.segs=self.doc.prepareGcode()
+            self.total=self.doc.gcodeCount(self.segs)
+        return self.total
+
+    def __iter__(self):
+        len(self)
+        return self.doc.iterGcode(self.segs, self.lock, self.order)
+
 class Document:
+    importCache=ImportCache()
+
     def __init__(self):
         self.segs=[]
         self.gcode=[]
@@ -49,6 +102,9 @@ class Document:
         self.lift=10.0
         self.filename=''
         self.mode=1
+        self.optimizeTime=0.0
+        self.travelSaved=0.0
+        self.joinTol=0.0
         self.objects=[]
 
     def __getstate__(self):
@@ -59,6 +115,9 @@ class Document:
         return state
 
     def __setstate__(self, state):
+        self.optimizeTime=0.0
+        self.travelSaved=0.0
+        self.joinTol=0.0
         self.__dict__.update(state)
         self.filename=''
         self.segs=[]
@@ -86,165 +145,267 @@ class Document:
                 a[i]=-self.segs[i][0][1]
             return np.argsort(a)
 
-    def joinSegsDist(self, i, j, D):
-        self.segs[i] = self.segs[i]+self.segs[j][1:]
-        del self.segs[j]
-        D[i]=D[j]
-        D[i,i]=np.inf
-        D=np.delete(D,j,0)
-        D=np.delete(D,j,1)
-
-    def closestSeg(self, ii, toCheck):
-        imin=toCheck[0]+1
-        dmin=np.inf
-        for i in range(0,len(toCheck)):
-            d1=distance(self.segs[ii][-1],self.segs[toCheck[i]][0])
-            d2=distance(self.segs[ii][-1],self.segs[toCheck[i]][-1])
-            if d1<dmin:
-                dmin=d1
-                imin=toCheck[i]+1
-            if d2<dmin:
-                dmin=d2
-                imin=-(toCheck[i]+1)
-        return imin
-
-    def sortGreedy(self):
-        toCheck=list(range(len(self.segs)))
-        ret=[]
-        temp=maxLen(self.segs)+1
+    def iterGreedy(self):
+        n=len(self.segs)
+        if n==0:
+            return
+        pts, starts, counts = packSegs(self.segs)
+        ends=np.empty((2*n,2))
+        ends[0::2]=pts[starts]
+        ends[1::2]=pts[starts+counts-1]
+        grid=PointGrid(ends)
+        cur=int(np.argmax(segLengths(pts, starts, counts)))
+        end=2*cur+1
         while True:
-            toCheck.remove(abs(temp)-1)
-            ret.append(temp)
-            if len(toCheck)==0:
+            grid.remove(2*cur)
+            grid.remove(2*cur+1)
+            yield cur
+            if grid.count==0:
                 break
-            temp=self.closestSeg(abs(temp)-1, toCheck)
-            if temp<0:
-                self.segs[abs(temp)-1].reverse()
-        for i in range(len(ret)):
-            ret[i]=abs(ret[i])-1
-        return ret
+            x, y = grid.xy[end]
+            d, i = grid.nearest(x, y)
+            i=int(i)
+            cur=i//2
+            end=i^1
+            if i%2:
+                self.segs[cur] = self.segs[cur][::-1]
+
+    def sortGreedy(self):
+        return list(self.iterGreedy())
+
+    def joinMatch(self, grid, p, tol, prefer):
+        ids=grid.queryRadius(float(p[0]), float(p[1]), tol)
+        if not ids:
+            return None
+        return min(ids, key=lambda i: (i%2!=prefer, i))
 
     def joinSegs(self):
         n=len(self.segs)
-        D=np.ones((n,n))*np.inf
-        for i in range(0,n):
-            for j in range(0,n):
-                if i!=j:
-                    D[i,j] = distance(self.segs[i][-1], self.segs[j][0])
-        while True:
-            a = (D.min(1)==0)
-            if a.any()==False:
-                break
-            i=a.argmax()
-            j=D.argmin(1)[i]
-            self.joinSegsDist(i,j,D)
-        return D
+        if n<2:
+            return
+        ends=np.array([[seg[0], seg[-1]] for seg in self.segs], dtype=float).reshape(-1,2)
+        tol=max(self.joinTol, 0.0)
+        grid=PointGrid(ends, max(tol, cellSizeFor(ends)))
+        ret=[]
+        for i in range(n):
+            if not grid.alive[2*i]:
+                continue
+            grid.remove(2*i)
+            grid.remove(2*i+1)
+            head=[]
+            tail=[self.segs[i]]
+            last=self.segs[i][-1]
+            while True:
+                j=self.joinMatch(grid, last, tol, 0)
+                if j is None:
+                    break
+                grid.remove(j)
+                grid.remove(j^1)
+                seg=self.segs[j//2] if j%2==0 else self.segs[j//2][::-1]
+                tail.append(seg[1:])
+                last=seg[-1]
+            first=self.segs[i][0]
+            while True:
+                j=self.joinMatch(grid, first, tol, 1)
+                if j is None:
+                    break
+                grid.remove(j)
+                grid.remove(j^1)
+                seg=self.segs[j//2] if j%2==1 else self.segs[j//2][::-1]
+                head.append(seg[:-1])
+                first=seg[0]
+            parts=head[::-1]+tail
+            ret.append(np.concatenate(parts) if len(parts)>1 else parts[0])
+        self.segs=ret
 
-    def orderSegments(self, order=0):
-        D=self.joinSegs()
+    def iterOrder(self, order=0):
+        if len(self.segs)==0:
+            return iter([])
         if order<=0:
-            segOrd=self.sortGreedy()
-        elif order==1:
-            segOrd=self.sortSegs(0)
-        elif order==2:
-            segOrd=self.sortSegs(1)
-        elif order==3:
-            segOrd=self.sortSegs(2)
-        elif order==4:
-            segOrd=self.sortSegs(3)
+            return self.iterGreedy()
+        elif order<=4:
+            return iter(self.sortSegs(order-1))
         else:
-            raise 'Unknown order!'
+            raise ValueError('Unknown order!')
 
-        dist=0.0
-        bdist=0.0
-        ret=[]
-        for i in range(len(segOrd)):
-            ret.append(self.segs[segOrd[i]])
-        self.computeDistances()
-        self.segs = ret
+    def optimizeOrder(self):
+        self.travelSaved=0.0
+        if self.optimizeTime>0.0 and len(self.segs)>1:
+            self.segs, self.travelSaved = optimizePath(self.segs, self.optimizeTime)
 
     def computeDistances(self):
         self.travelDist=0.0
         self.cutDist=0.0
-        for i in range(len(self.segs)):
-            self.cutDist+=length(self.segs[i])
-            if i>0:
-                self.travelDist+=distance(self.segs[i-1][-1], self.segs[i][0])
+        if len(self.segs)>0:
+            self.cutDist=float(lengths(self.segs).sum())
+            self.travelDist=travel(np.array([seg[0] for seg in self.segs], dtype=float).reshape(-1,2),
+                                   np.array([seg[-1] for seg in self.segs], dtype=float).reshape(-1,2))
 
-    def updateGcode(self):
-        self.segs = []
+    def transformedSegs(self):
+        ret=[]
         for obj in self.objects:
-            for seg in obj.segs:
-                newSeg=[]
-                for pt in seg:
-                    newSeg.append(obj.transformPoint(pt))
-                self.segs.append(newSeg)
-        self.orderSegments()
+            pts=obj.transformedCoords()
+            o=obj.segs.offsets
+            ret+=[pts[o[i]:o[i+1]] for i in range(len(obj.segs))]
+        return ret
+
+    def working(self, segs):
+        ret=copy.copy(self)
+        ret.segs=segs
+        return ret
+
+    def gcodeStream(self, order=0, lock=None):
+        return GcodeStream(self, order, lock)
+
+    def prepareGcode(self):
+        work=self.working(self.transformedSegs())
+        work.joinSegs()
+        if len(work.segs)>0:
+            pts, starts, counts = packSegs(work.segs)
+            self.checkPoints(pts, starts, self.height+self.zoffset)
+        return work.segs
+
+    def gcodeCount(self, segs):
+        if len(segs)==0:
+            return 0
+        n=sum(len(seg) for seg in segs)
+        if self.mode == 1:
+            return n+4*len(segs)+1
+        return n+2*len(segs)
+
+    def iterGcode(self, segs, lock, order=0, maxChunk=1024):
+        work=self.working(list(segs))
+        ordered=[]
+        chunk=1
+        it=work.iterOrder(order)
+        if self.optimizeTime>0.0:
+            work.segs=[work.segs[i] for i in it]
+            work.optimizeOrder()
+            it=iter(range(len(work.segs)))
+        while True:
+            part=[work.segs[i] for i in itertools.islice(it, chunk)]
+            if len(part)==0:
+                break
+            ordered+=part
+            for line in self.gcodeLines(part):
+                yield line
+            chunk=min(2*chunk, maxChunk)
+        work.segs=ordered
+        work.computeDistances()
+        with lock:
+            self.segs=ordered
+            self.travelDist=work.travelDist
+            self.cutDist=work.cutDist
+            self.travelSaved=work.travelSaved
+        if self.mode == 1 and len(ordered)>0:
+            v=ordered[-1][0]
+            yield gCodeMove(v[0], v[1], self.height+self.zoffset, self.F0)
+
+    def checkPoints(self, pts, starts, z):
+        bad=np.flatnonzero(~checkCoords(pts[:,0], pts[:,1], z))
+        if len(bad)>0:
+            seg=np.searchsorted(starts, bad, side='right')-1
+            raise InvalidCoordinatesError([(seg[i], bad[i]-starts[seg[i]], pts[bad[i],0], pts[bad[i],1], z) for i in range(len(bad))])
+
+    def gcodeRows(self, pts, starts, counts):
+        rep=np.ones(len(pts), dtype=int)
+        rep[starts]+=1
+        rep[starts+counts-1]+=1
+        idx=np.repeat(np.arange(len(pts)), rep)
+        first=starts+2*np.arange(len(starts))
+        last=first+counts+1
+        return idx, first, last
+
+    def gcodeLines(self, segs):
+        pts, starts, counts = packSegs(segs)
+        idx, first, last = self.gcodeRows(pts, starts, counts)
+        z=self.height+self.zoffset
         if self.mode == 1:
-            self.updateGcodeBurn()
+            templates=np.full(len(idx), gcodeTemplate(BURN, z, self.F), dtype=object)
+            templates[first]=gcodeTemplate(MOVE, z, self.F0)
+            templates[first+1]=gcodeTemplate(MOVE, z, self.F/2.0)
+            templates[last]=gcodeTemplate(MOVE, z, self.F)
+            templates=np.insert(templates, np.concatenate((first+1, last+1)),
+                                [gCodeDelay(1000000)]*len(first)+[gCodeDelay(500000)]*len(last))
         else:
-            self.updateGcodeDraw()
+            templates=np.full(len(idx), gcodeTemplate(MOVE, z, self.F), dtype=object)
+            templates[first]=gcodeTemplate(MOVE, z+self.lift, self.F0)
+            templates[first+1]=gcodeTemplate(MOVE, z, self.F0)
+            templates[last]=gcodeTemplate(MOVE, z+self.lift, self.F0)
+        return formatLines(templates.tolist(), pts[idx])
 
     def updateGcodeBurn(self):
-        self.gcode = []       
+        self.gcode = []
+        if len(self.segs)==0:
+            return
         z=self.height+self.zoffset
-        for i in range(len(self.segs)):
-            v=self.segs[i][0]
-            if not checkCoords(v[0], v[1], z):
-                raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
-            self.gcode.append(gCodeMove(v[0], v[1], z, self.F0))
-            self.gcode.append(gCodeDelay(1000000))
-            self.gcode.append(gCodeMove(v[0], v[1], z, self.F/2.0))
-            for j in range(1,len(self.segs[i])):
-                v=self.segs[i][j]
-                if not checkCoords(v[0], v[1], z):
-                    raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
-                self.gcode.append(gCodeBurn(v[0], v[1], z, self.F))
-            v=self.segs[i][-1]
-            self.gcode.append(gCodeMove(v[0], v[1], z, self.F))
-            self.gcode.append(gCodeDelay(500000))
+        pts, starts, counts = packSegs(self.segs)
+        self.checkPoints(pts, starts, z)
+        self.gcode=self.gcodeLines(self.segs)
         v=self.segs[-1][0]
-        if not checkCoords(v[0], v[1], z):
-            raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
         self.gcode.append(gCodeMove(v[0], v[1], z, self.F0))
 
     def updateGcodeDraw(self):
         self.gcode = []
-        z=self.height+self.zoffset
-        for i in range(len(self.segs)):
-            v=self.segs[i][0]
-            if not checkCoords(v[0], v[1], z):
-                raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
-            if not checkCoords(v[0], v[1], z):
-                raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z+self.lift))
-            self.gcode.append(gCodeMove(v[0], v[1], z+self.lift, self.F0))
-            self.gcode.append(gCodeMove(v[0], v[1], z, self.F0))
-            for j in range(1,len(self.segs[i])):
-                v=self.segs[i][j]
-                if not checkCoords(v[0], v[1], z):
-                    raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
-                self.gcode.append(gCodeMove(v[0], v[1], z, self.F))
-            v=self.segs[i][-1]
-            if not checkCoords(v[0], v[1], z):
-                raise('Invalid coordinates (%f, %f, %f)'%(v[0], v[1], z))
-            self.gcode.append(gCodeMove(v[0], v[1], z+self.lift, self.F0))
+        if len(self.segs)==0:
+            return
+        pts, starts, counts = packSegs(self.segs)
+        self.checkPoints(pts, starts, self.height+self.zoffset)
+        self.gcode=self.gcodeLines(self.segs)
 
     def save(self, filename=None):
         if filename == None:
             filename=self.filename
-        pickle.dump(self,open(filename,'wb'))
+        settings={}
+        for key, val in self.__getstate__().items():
+            if isinstance(val, np.generic):
+                val=val.item()
+            if key!='objects' and isinstance(val, (int, float, str, bool)):
+                settings[key]=val
+        objects=[]
+        arrays={}
+        for i, obj in enumerate(self.objects):
+            if obj.source and os.path.abspath(obj.source)==os.path.abspath(filename):
+                obj.materialize()
+            arrays['coords%d'%i]=obj.segs.coords
+            arrays['offsets%d'%i]=obj.segs.offsets
+            objects.append({'transform': np.asarray(obj.transform).tolist(), 'bbox': [float(v) for v in obj.bbox],
+                            'coords': 'coords%d'%i, 'offsets': 'offsets%d'%i})
+        writeContainer(filename, {'document': settings, 'objects': objects}, arrays)
+
+    @staticmethod
+    def loadBinary(filename):
+        header, start = readHeader(filename)
+        ret=Document()
+        ret.__dict__.update(header['document'])
+        arrays=header['arrays']
+        for o in header['objects']:
+            obj=DocumentObject()
+            obj.transform=np.array(o['transform'], dtype=float)
+            obj.setSource(filename, start, arrays[o['coords']], arrays[o['offsets']])
+            obj.bbox=o['bbox']
+            obj.center=[(obj.bbox[0]+obj.bbox[2])*0.5,(obj.bbox[1]+obj.bbox[3])*0.5]
+            ret.objects.append(obj)
+        return ret
 
     def importObject(self, filename, type):
-        if type=='plt':
-            ret=DocumentObject()
-            ret.importPLYraw(str(filename))
-            self.objects.append(ret)
-        elif type=='svg':
-            ret=DocumentObject()
-            ret.importSVG(str(filename))
-            self.objects.append(ret)
-        else:
+        if type not in ('plt', 'svg'):
             raise ValueError('Unknown file type `'+type+'`')
+        ret=DocumentObject()
+        cache=Document.importCache
+        key=cache.key(str(filename), type, ret.importParams(type)) if cache else None
+        segs=cache.load(key) if cache else None
+        if segs is not None:
+            ret.segs=segs
+            ret.updateBoundingBox()
+        else:
+            if type=='plt':
+                ret.importPLYraw(str(filename))
+            else:
+                ret.importSVG(str(filename))
+            if cache:
+                cache.store(key, ret.segs)
+        self.objects.append(ret)
 
     @staticmethod
     def load(filename):
@@ -253,12 +414,15 @@ class Document:
             ret.importObject(str(filename),'plt')
             ret.filename=str(filename)
         elif filename[-5:]=='.uarm':
-            ret=pickle.load(open(filename,'rb'))
+            if isContainer(filename):
+                ret=Document.loadBinary(filename)
+            else:
+                ret=pickle.load(open(filename,'rb'))
+                for obj in ret.objects:
+                    obj.updateBoundingBox()
             ret.filename=str(filename)
         elif filename[-4:]=='.svg':
             ret=Document()
             ret.importObject(str(filename),'svg')
             ret.filename=str(filename)
-        for obj in ret.objects:
-            obj.updateBoundingBox()
         return ret
@@ -1,29 +1,134 @@
 import numpy as np
-from svgpathtools import svg2paths
-from xml.dom.minidom import parse
+from xml.etree.ElementTree import iterparse
+from Polyline import *
+from SpatialIndex import *
+from Flatten import *
+from HPGL import *
+from UarmFile import *
+
+def parseTransform(trans):
+    if not trans:
+        return np.identity(3)
+    if trans.startswith('matrix'):
+        arr=np.array([float(val) for val in trans[7:-1].split(',')])
+        return np.append(arr.reshape(3,2).transpose(),[[0,0,1]],0)
+    elif trans.startswith('translate'):
+        arr=[float(val) for val in trans[10:-1].split(',')]
+        if len(arr)==1:
+            arr.append(0.0)
+        return np.array([[1,0,arr[0]],[0,1,arr[1]],[0,0,1]], dtype=float)
+    elif trans.startswith('scale'):
+        arr=[float(val) for val in trans[6:-1].split(',')]
+        if len(arr)==1:
+            arr.append(arr[0])
+        return np.array([[arr[0],0,0],[0,arr[1],0],[0,0,1]], dtype=float)
+    elif trans.startswith('rotate'):
+        arr=[float(val) for val in trans[7:-1].split(',')]
+        if len(arr)==1:
+            arr+=[0.,0.]
+        return np.array([[ np.cos(arr[0]),-np.sin(arr[0]),arr[1]-arr[1]*np.cos(arr[0])+arr[2]*np.sin(arr[0])],
+                         [ np.sin(arr[0]),np.cos(arr[0]),arr[2]-arr[2]*np.cos(arr[0])-arr[1]*np.sin(arr[0])],
+                         [0,0,1]])
+    elif trans.startswith('skewX'):
+        arr=[float(val) for val in trans[6:-1].split(',')]
+        return np.array([[1,np.tan(arr[0]),0],[0,1,0],[0,0,1]])
+    elif trans.startswith('skewY'):
+        arr=[float(val) for val in trans[6:-1].split(',')]
+        return np.array([[1,0,0],[np.tan(arr[0]),1,0],[0,0,1]])
+    else:
+        raise ValueError('Wrong trnsformation value!')
+
+def iterSvgPaths(filename):
+    stack=[np.identity(3)]
+    for event, el in iterparse(filename, events=('start', 'end')):
+        tag=el.tag.rsplit('}', 1)[-1]
+        if tag=='path':
+            if event=='end':
+                yield el.get('d', ''), stack[-1]
+                el.clear()
+        elif tag in ('polyline','polygon','line','ellipse','circle','rect'):
+            raise RuntimeError('Non-path type vector objects are not supported. Please convert all objects to paths!')
+        elif event=='start':
+            trans=el.get('transform')
+            stack.append(stack[-1].dot(parseTransform(trans)) if trans else stack[-1])
+        else:
+            stack.pop()
+            el.clear()
 
 class DocumentObject:
+    lodBase=0.01
+    lodLevels=24
+    parallelMinSize=100000
+    pltUnit=49.6
+    svgThr=0.03
+    svgMinArc=0.5
+
     def __init__(self):
-        self.segs=[]
+        self.segs=Polyline()
         self.transform = np.identity(3)
+        self.cache=None
+        self.hullCache=None
+        self.snapCache=None
+        self.lodCache=None
+        self.source=None
+        self.sourceArrays=None
         self.updateBoundingBox()
         self.deselectCallback=None
         self.selectCallback=None
         self.moving = False
 
+    def __getattr__(self, name):
+        if name=='segs' and self.__dict__.get('sourceArrays') is not None:
+            self.loadGeometry()
+            return self.__dict__['segs']
+        raise AttributeError(name)
+
     def __getstate__(self):
+        self.loadGeometry()
         state = self.__dict__.copy()
         del state['deselectCallback']
         del state['selectCallback']
         del state['moving']
+        state.pop('cache', None)
+        state.pop('hullCache', None)
+        state.pop('snapCache', None)
+        state.pop('lodCache', None)
+        state.pop('source', None)
+        state.pop('sourceArrays', None)
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
+        self.segs=Polyline.fromSegs(self.segs)
+        self.cache=None
+        self.hullCache=None
+        self.snapCache=None
+        self.lodCache=None
+        self.source=None
+        self.sourceArrays=None
         self.deselectCallback=None
         self.selectCallback=None
         self.moving = False
 
+    def isLoaded(self):
+        return self.sourceArrays is None
+
+    def setSource(self, filename, start, coords, offsets):
+        self.__dict__.pop('segs', None)
+        self.cache=None
+        self.hullCache=None
+        self.snapCache=None
+        self.lodCache=None
+        self.source=filename
+        self.sourceArrays=(start, coords, offsets)
+
+    def loadGeometry(self):
+        if self.sourceArrays is None:
+            return
+        start, coords, offsets = self.sourceArrays
+        self.segs=Polyline(mapArray(self.source, start, coords), mapArray(self.source, start, offsets))
+        self.sourceArrays=None
+
     def onselect(self,rect, mode=1):
         if rect[0]<self.bbox[0] and rect[1]<self.bbox[1] and rect[2]>self.bbox[2] and rect[3]>self.bbox[3]:
             if mode==1 or mode==2:
@@ -43,146 +148,115 @@ class DocumentObject:
             self.deselectCallback()
         
     def move(self, trans):
+        old=np.array(self.transform[0:2,0:3])
         for i in range(2):
             for j in range(3):
                 self.transform[i,j] = trans[i,j]
-        self.updateBoundingBox()
+        self.cache=None
+        if np.array_equal(old[:,0:2], self.transform[0:2,0:2]) and np.isfinite(self.bbox).all():
+            dx=float(self.transform[0,2]-old[0,2])
+            dy=float(self.transform[1,2]-old[1,2])
+            self.bbox=[self.bbox[0]+dx,self.bbox[1]+dy,self.bbox[2]+dx,self.bbox[3]+dy]
+            self.center=[self.center[0]+dx,self.center[1]+dy]
+        else:
+            self.updateBoundingBox()
+
+    def materialize(self):
+        self.loadGeometry()
+        self.segs=Polyline(np.array(self.segs.coords), np.array(self.segs.offsets))
+        self.cache=None
+        self.hullCache=None
+        self.snapCache=None
+        self.lodCache=None
+        self.source=None
 
-    def transformPoint(self, pt):
-        return (self.transform*np.matrix([[pt[0],pt[1],1]]).transpose()).transpose().tolist()[0][0:2]
+    def transformPoints(self, pts):
+        T=np.asarray(self.transform)
+        return np.asarray(pts, dtype=float).reshape(-1,2).dot(T[0:2,0:2].transpose())+T[0:2,2]
+
+    def transformedCoords(self):
+        if self.cache is None or self.cache[0] is not self.segs:
+            self.cache=(self.segs, self.transformPoints(self.segs.coords))
+        return self.cache[1]
+
+    def localHull(self):
+        if self.hullCache is None or self.hullCache[0] is not self.segs:
+            self.hullCache=(self.segs, convexHull(self.segs.coords))
+        return self.hullCache[1]
+
+    def snapIndex(self):
+        if self.snapCache is None or self.snapCache[0] is not self.segs:
+            ends=np.concatenate((self.segs.starts(), self.segs.ends()))
+            a, b = self.segs.edges()
+            self.snapCache=(self.segs, PointGrid(ends), SegmentGrid(self.segs.coords[a], self.segs.coords[b]))
+        return self.snapCache[1:]
+
+    def snapQuery(self, x, y, radius, edges=False):
+        T=np.asarray(self.transform)
+        A=T[0:2,0:2]
+        s=np.linalg.svd(A, compute_uv=False)
+        if len(self.segs.coords)==0 or s[-1]<=1e-12:
+            return None, []
+        lx, ly = np.linalg.solve(A, [x-T[0,2], y-T[1,2]])
+        grid=self.snapIndex()[1 if edges else 0]
+        return grid, grid.queryRadius(float(lx), float(ly), radius/s[-1])
+
+    def snapCandidates(self, x, y, radius):
+        grid, ids = self.snapQuery(x, y, radius)
+        if not ids:
+            return np.zeros((0,2))
+        return self.transformPoints(grid.pts[ids])
+
+    def snapEdges(self, x, y, radius):
+        grid, ids = self.snapQuery(x, y, radius, edges=True)
+        if not ids:
+            return np.zeros((0,2)), np.zeros((0,2))
+        return self.transformPoints(grid.A[ids]), self.transformPoints(grid.B[ids])
+
+    def lodLevel(self, level):
+        if self.lodCache is None or self.lodCache[0] is not self.segs:
+            self.lodCache=(self.segs, {})
+        levels=self.lodCache[1]
+        if level not in levels:
+            segs=self.segs if level<0 else self.segs.decimate(DocumentObject.lodBase*2**level)
+            levels[level]=(segs, )+segs.bounds()
+        return levels[level]
+
+    def lodSegments(self, rect, pixel):
+        T=np.asarray(self.transform)
+        A=T[0:2,0:2]
+        s=np.linalg.svd(A, compute_uv=False)
+        if len(self.segs)==0 or s[-1]<=1e-12:
+            return list(self.segs)
+        level=-1
+        if pixel>0.0:
+            level=min(int(np.floor(np.log2(pixel/s[0]/DocumentObject.lodBase))), DocumentObject.lodLevels)
+        segs, lo, hi = self.lodLevel(max(level, -1))
+        corners=np.array([[rect[0],rect[1]],[rect[2],rect[1]],[rect[0],rect[3]],[rect[2],rect[3]]])
+        local=np.linalg.solve(A, (corners-T[0:2,2]).transpose()).transpose()
+        visible=np.flatnonzero((lo<=local.max(0)).all(1)&(hi>=local.min(0)).all(1))
+        c=segs.coords
+        o=segs.offsets
+        return [c[o[i]:o[i+1]] for i in visible]
 
     def updateBoundingBox(self):
         self.bbox=[np.inf,np.inf,-np.inf,-np.inf]
         self.center=[0,0]
-        for seg in self.segs:
-            for pt in seg:
-                ptt=self.transformPoint(pt)
-                self.bbox[0]=min(self.bbox[0],ptt[0])
-                self.bbox[1]=min(self.bbox[1],ptt[1])
-                self.bbox[2]=max(self.bbox[2],ptt[0])
-                self.bbox[3]=max(self.bbox[3],ptt[1])
+        if len(self.segs.coords)>0:
+            pts=self.transformPoints(self.localHull())
+            self.bbox=pts.min(0).tolist()+pts.max(0).tolist()
         self.center=[(self.bbox[0]+self.bbox[2])*0.5,(self.bbox[1]+self.bbox[3])*0.5]
 
+    def importParams(self, type):
+        if type=='plt':
+            return (DocumentObject.pltUnit, )
+        return (DocumentObject.svgThr, DocumentObject.svgMinArc)
+
     def importPLYraw(self, filename):
-        f=open(filename)
-        cmds=f.read().split(';')
-        f.close()
-        unit=49.6
-
-        self.segs = []
-        if cmds[0]!='IN':
-            raise 'Invalid PLT file format'
-
-        self.segs = []
-        prev_pos = [0,0]
-        nseg=0
-        for cmd in cmds:
-            if len(cmd)<2:
-                continue
-            c = cmd[0:2]
-            if len(cmd)<=2:
-                v = prev_pos
-            else:
-                vs = cmd[2:].split(',')
-                v = [float(vs[1])/unit, 105.0-float(vs[0])/unit]
-                prev_pos=v
-            if c == 'IN':
-                continue
-            if c == 'PU':
-                self.segs.append([])
-                nseg=nseg+1
-                self.segs[nseg-1].append(v)
-            if c == 'PD':
-                self.segs[nseg-1].append(v)
-        self.segs=self.segs[0:-1]
+        self.segs=readHPGL(filename, DocumentObject.pltUnit)
         self.updateBoundingBox()
 
-    def importSVG(self, filename):
-        def pt2list(pt, trans):
-            pos = trans*np.matrix([[pt.real],[pt.imag],[1]])
-            pos=pos[0:2,0].transpose().tolist()[0]
-            return [297.0-pos[1],105.0-pos[0]]
-
-        def splitCurve(seg, append, trans, thr=0.01, minArc=0.001):
-            if append:
-                ret=[]
-            else:
-                ret = [pt2list(seg.point(0.0), trans)]
-            t=0.0
-            cur=seg.curvature(t)
-            arcMax=seg.length()
-            while cur>0.0 and t<1.0:
-                t=min(t+max(minArc,thr/cur)/arcMax,1.0)
-                if t<1.0:
-                    ret.append(pt2list(seg.point(t), trans))
-                    cur=seg.curvature(t)
-            ret.append(pt2list(seg.point(1.0), trans))
-            return ret
-
-        def parseTrans(trans):
-            if not trans:
-                return np.matrix([[1,0,0],[0,1,0],[0,0,1]])
-            if trans.startswith('matrix'):
-                arr=np.array([float(val) for val in trans[7:-1].split(',')])
-                arr=np.append(arr.reshape(3,2).transpose(),[[0,0,1]],0)
-                return np.matrix(arr)
-            elif trans.startswith('translate'):
-                arr=[float(val) for val in trans[10:-1].split(',')]
-                if len(arr)==1:
-                    arr.append(0.0)
-                return np.matrix([[1,0,arr[0]],[0,1,arr[1]],[0,0,1]])
-            elif trans.startswith('scale'):
-                arr=[float(val) for val in trans[6:-1].split(',')]
-                if len(arr)==1:
-                    arr.append(arr[0])
-                return np.matrix([[arr[0],0,0],[0,arr[1],0],[0,0,1]])
-            elif trans.startswith('rotate'):
-                arr=[float(val) for val in trans[7:-1].split(',')]
-                if len(arr)==1:
-                    arr+=[0.,0.]
-                return np.matrix([[ np.cos(arr[0]),-np.sin(arr[0]),arr[1]-arr[1]*np.cos(arr[0])+arr[2]*np.sin(arr[0])],
-                                  [ np.sin(arr[0]),np.cos(arr[0]),arr[2]-arr[2]*np.cos(arr[0])-arr[1]*np.sin(arr[0])],
-                                  [0,0,1]])
-            elif trans.startswith('skewX'):
-                arr=[float(val) for val in trans[6:-1].split(',')]
-                return np.matrix([[1,np.tan(arr[0]),0],[0,1,0],[0,0,1]])
-            elif trans.startswith('skewY'):
-                arr=[float(val) for val in trans[6:-1].split(',')]
-                return np.matrix([[1,0,0],[np.tan(arr[0]),1,0],[0,0,1]])
-            else:
-                raise ValueError('Wrong trnsformation value!')
-
-        def getTransforms(filename, attributes):
-            doc = parse(filename)
-            ret=[]
-            parents={}
-            for geometryType in ['path','polyline','polygon','line','ellipse','circle','rect']:
-                newParents={el.getAttribute('id'): el.parentNode for el in doc.getElementsByTagName(geometryType)}
-                parents.update(newParents)
-                if geometryType != 'path' and len(newParents)>0:
-                    raise RuntimeError('Non-path type vector objects are not supported. Please convert all objects to paths!')
-            for attr in attributes:
-                id=attr.get('id')
-                trans = np.matrix([[1,0,0],[0,1,0],[0,0,1]]);
-                group = parents[id]
-                while group!=doc:
-                    trans = parseTrans(group.getAttribute('transform'))*trans
-                    group = group.parentNode
-                ret.append(trans)
-            return ret
-
-        paths, attributes = svg2paths(filename)
-        trans = getTransforms(filename, attributes)
-
-        self.segs=[]
-        i=0
-        for rpath in paths:
-            for cpath in rpath.continuous_subpaths():
-                subsegs=[]
-                append=False
-                for segment in cpath:
-                    subsegs+=splitCurve(segment,append,trans[i],thr=0.03, minArc=0.5)
-                    append=True
-                self.segs.append(subsegs)
-            i+=1
-        self.updateBoundingBox()
\ No newline at end of file
+    def importSVG(self, filename, workers=None):
+        self.segs=flattenPaths(list(iterSvgPaths(filename)), thr=DocumentObject.svgThr, minArc=DocumentObject.svgMinArc,
+                               workers=workers, minSize=DocumentObject.parallelMinSize)
+        self.updateBoundingBox()
@@ -31,6 +31,7 @@ class DocumentPropertiesDialog(QtWidgets.QDialog):
         self.doubleF0.setValue(self.doc.F0)
         self.doubleZoffset.setValue(self.doc.zoffset)
         self.doubleLift.setValue(self.doc.lift)
+        self.doubleOptimize.setValue(self.doc.optimizeTime)
 
     def storeProperties(self):
         if self.comboMode.currentIndex() == 0:
@@ -42,6 +43,7 @@ class DocumentPropertiesDialog(QtWidgets.QDialog):
         self.doc.F0 = self.doubleF0.value()
         self.doc.zoffset = self.doubleZoffset.value()
         self.doc.lift = self.doubleLift.value()
+        self.doc.optimizeTime = self.doubleOptimize.value()
 
     @staticmethod
     def getProperties(parent = None, doc=None):
@@ -17,6 +17,7 @@ from SnaptoCursor import *
 from DocumentPropertiesDialog import *
 from Document import *
 from ObjectWidget import *
+from Scene import *
 
 def getArc(d):
     th0=np.arcsin(105.0/d)
@@ -46,6 +47,12 @@ class DocumentWindow(QtWidgets.QMainWindow):
 
         self.plt = self.fig.gca()
         self.doc = doc
+        self.scene = Scene(self.plt)
+        self.scene.beforeDraw = self.flushLOD
+        self.lodDirty = False
+        self.loadTimer = QtCore.QTimer(self)
+        self.loadTimer.timeout.connect(self.loadStep)
+        self.pendingLoad = []
         self.updatePlot()
 
         self.actionProperties.triggered.connect(self.updateProperties)
@@ -65,8 +72,7 @@ class DocumentWindow(QtWidgets.QMainWindow):
         if filename:
             self.parent.settings.setValue('OpenFilePath',os.path.dirname(str(filename)))
             self.doc.importObject(str(filename),str(filename)[-3:])
-            self.updatePlot()
-            self.canvas.draw()
+            self.addObject(self.doc.objects[-1])
             self.doc.objects[-1].select()
 
     def updateProperties(self):
@@ -84,6 +90,8 @@ class DocumentWindow(QtWidgets.QMainWindow):
             dataTrans=lc.get_transform()
             lc.set_transform(transforms.CompositeGenericTransform(objectTrans,dataTrans))
             ObjectWidget(lc,owner,self)
+            self.scene.add(owner, lc)
+        return lc
 
     def getGrid(self):
         ret=[]
@@ -105,14 +113,73 @@ class DocumentWindow(QtWidgets.QMainWindow):
                     [[0,0],[260,0]]],
                     colors=[0.9,0.9,0.9,1], linestyles=':', linewidths=2)
 
+    def addObject(self, obj):
+        self.plot(obj.segs, owner=obj)
+        x0, x1 = sorted(self.plt.get_xlim())
+        y0, y1 = sorted(self.plt.get_ylim())
+        if obj.bbox[0]<x0 or obj.bbox[1]<y0 or obj.bbox[2]>x1 or obj.bbox[3]>y1:
+            self.plt.autoscale_view()
+            self.canvas.draw_idle()
+        else:
+            self.updateLOD()
+            self.scene.update()
+
+    def placeholder(self, obj):
+        x0, y0, x1, y1 = obj.bbox
+        pts=np.array([[x0,y0,1],[x1,y0,1],[x1,y1,1],[x0,y1,1],[x0,y0,1]])
+        return [np.dot(pts, np.linalg.inv(obj.transform).T)[:,0:2]]
+
     def updatePlot(self):
         self.plt.clear()
+        self.scene.clear()
         self.plotSheet()
+        self.pendingLoad = []
         for obj in self.doc.objects:
-            self.plot(obj.segs, owner=obj)
+            if obj.isLoaded():
+                self.plot(obj.segs, owner=obj)
+            else:
+                self.pendingLoad.append((obj, self.plot(self.placeholder(obj), linestyles=':', owner=obj)))
+                self.plt.update_datalim([obj.bbox[0:2], obj.bbox[2:4]])
         self.plt.autoscale()
         self.plt.axis('equal')
         self.plt.margins(0.05)
+        self.plt.callbacks.connect('xlim_changed', self.invalidateLOD)
+        self.plt.callbacks.connect('ylim_changed', self.invalidateLOD)
+        self.updateLOD()
+
+    def lodView(self):
+        x0, x1 = sorted(self.plt.get_xlim())
+        y0, y1 = sorted(self.plt.get_ylim())
+        w=x1-x0
+        h=y1-y0
+        return [x0-w, y0-h, x1+w, y1+h], w/max(self.plt.bbox.width, 1.0)
+
+    def invalidateLOD(self, ax=None):
+        self.lodDirty = True
+
+    def flushLOD(self):
+        if self.lodDirty:
+            self.updateLOD()
+
+    def updateLOD(self, ax=None):
+        self.lodDirty = False
+        rect, pixel = self.lodView()
+        pending=[lc for obj, lc in self.pendingLoad]
+        for obj, lc in self.scene.items():
+            if lc not in pending:
+                lc.set_segments(obj.lodSegments(rect, pixel))
+        if self.pendingLoad:
+            self.loadTimer.start(0)
+
+    def loadStep(self):
+        if not self.pendingLoad:
+            self.loadTimer.stop()
+            return
+        obj, lc = self.pendingLoad.pop(0)
+        obj.loadGeometry()
+        lc.set_linestyle('solid')
+        lc.set_segments(obj.lodSegments(*self.lodView()))
+        self.scene.update()
 
     def onselect(self, eclick, erelease):
         'eclick and erelease are matplotlib events at press and release'
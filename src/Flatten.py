@@ -0,0 +1,127 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from svgpathtools import Arc, Line, QuadraticBezier, parse_path
+from Polyline import *
+
+def cubicControls(seg):
+    if isinstance(seg, Line):
+        a, b = seg.start, seg.end
+        return [a, a+(b-a)/3.0, a+(b-a)*2.0/3.0, b]
+    if isinstance(seg, QuadraticBezier):
+        a, c, b = seg.start, seg.control, seg.end
+        return [a, a+(c-a)*2.0/3.0, b+(c-b)*2.0/3.0, b]
+    return list(seg.bpoints())
+
+def cubicEval(P, t):
+    s=1.0-t
+    P0, P1, P2, P3 = P[...,0], P[...,1], P[...,2], P[...,3]
+    z=s*s*s*P0+3.0*s*s*t*P1+3.0*s*t*t*P2+t*t*t*P3
+    d1=3.0*(s*s*(P1-P0)+2.0*s*t*(P2-P1)+t*t*(P3-P2))
+    d2=6.0*(s*(P2-2.0*P1+P0)+t*(P3-2.0*P2+P1))
+    return z, d1, d2
+
+def arcEval(seg, t):
+    a=np.radians(seg.theta+t*seg.delta)
+    da=np.radians(seg.delta)
+    rx, ry = seg.radius.real, seg.radius.imag
+    rot=seg.rot_matrix
+    z=seg.center+rot*(rx*np.cos(a)+1j*ry*np.sin(a))
+    d1=rot*(-rx*np.sin(a)+1j*ry*np.cos(a))*da
+    d2=rot*(-rx*np.cos(a)-1j*ry*np.sin(a))*da*da
+    return z, d1, d2
+
+def sampleCount(length, minArc):
+    m=np.clip(4.0*np.asarray(length)/minArc, 16, 8192)
+    return (2**np.ceil(np.log2(m))).astype(int)
+
+def arcSteps(z, d1, d2, thr, minArc):
+    speed=np.abs(d1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cur=np.abs((np.conj(d1)*d2).imag)/speed**3
+        cur[speed==0.0]=np.inf
+        ds=np.maximum(minArc, thr/(0.5*(cur[...,1:]+cur[...,:-1])))
+        steps=np.cumsum(np.abs(np.diff(z))/ds, -1)
+    return np.concatenate((np.zeros(steps.shape[:-1]+(1, )), steps), -1)
+
+def flattenCubics(P, thr, minArc, batch=1<<16):
+    ret=[None]*len(P)
+    M=sampleCount(np.abs(np.diff(P, axis=1)).sum(1), minArc)
+    for m in np.unique(M):
+        t=np.linspace(0.0, 1.0, m+1)
+        group=np.flatnonzero(M==m)
+        size=max(1, batch//(m+1))
+        for b in range(0, len(group), size):
+            rows=group[b:b+size]
+            Q=P[rows]
+            steps=arcSteps(*cubicEval(Q[:,None,:], t[None,:]), thr, minArc)
+            cnt=np.maximum(np.ceil(steps[:,-1]).astype(int)-1, 0)
+            off=np.arange(len(rows))*(steps[:,-1].max()+2.0)
+            row=np.repeat(np.arange(len(rows)), cnt)
+            k=np.arange(cnt.sum())-np.repeat(np.cumsum(cnt)-cnt, cnt)+1
+            tk=np.interp(k+off[row], (steps+off[:,None]).ravel(), np.tile(t, len(rows)))
+            inner=np.split(cubicEval(Q[row], tk)[0], np.cumsum(cnt)[:-1])
+            for j, r in enumerate(rows):
+                ret[r]=np.append(inner[j], P[r,3])
+    return ret
+
+def flattenArc(seg, thr, minArc):
+    m=int(sampleCount(abs(np.radians(seg.delta))*max(abs(seg.radius.real), abs(seg.radius.imag)), minArc))
+    t=np.linspace(0.0, 1.0, m+1)
+    steps=arcSteps(*arcEval(seg, t), thr, minArc)
+    n=max(int(np.ceil(steps[-1]))-1, 0)
+    inner=arcEval(seg, np.interp(np.arange(1, n+1), steps, t))[0]
+    return np.append(inner, seg.end)
+
+def flattenSubpath(cpath, thr=0.01, minArc=0.001):
+    arcs=[i for i, seg in enumerate(cpath) if isinstance(seg, Arc)]
+    cubics=[i for i, seg in enumerate(cpath) if not isinstance(seg, Arc)]
+    pieces=[None]*len(cpath)
+    if cubics:
+        P=np.array([cubicControls(cpath[i]) for i in cubics], dtype=complex)
+        for i, piece in zip(cubics, flattenCubics(P, thr, minArc)):
+            pieces[i]=piece
+    for i in arcs:
+        pieces[i]=flattenArc(cpath[i], thr, minArc)
+    return np.concatenate([[cpath[0].start]]+pieces)
+
+def flattenPath(path, trans, thr=0.01, minArc=0.001):
+    T=np.asarray(trans, dtype=float)
+    ret=[]
+    for cpath in path.continuous_subpaths():
+        if len(cpath)==0:
+            continue
+        z=flattenSubpath(cpath, thr, minArc)
+        x=T[0,0]*z.real+T[0,1]*z.imag+T[0,2]
+        y=T[1,0]*z.real+T[1,1]*z.imag+T[1,2]
+        ret.append(np.stack((297.0-y, 105.0-x), 1))
+    return ret
+
+def flattenChunk(chunk, thr=0.01, minArc=0.001):
+    segs=[]
+    for d, trans in chunk:
+        segs+=flattenPath(parse_path(d), trans, thr, minArc)
+    counts=[len(seg) for seg in segs]
+    if not segs:
+        return np.zeros((0,2)), counts
+    return np.concatenate(segs), counts
+
+def chunkPaths(items, n):
+    sizes=np.array([len(d) for d, trans in items], dtype=float)
+    bounds=np.searchsorted(np.cumsum(sizes), np.arange(1, n)*sizes.sum()/n)
+    bounds=np.unique(np.concatenate(([0], bounds, [len(items)])))
+    return [items[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b>a]
+
+def flattenPaths(items, thr=0.01, minArc=0.001, workers=None, minSize=100000):
+    if workers is None:
+        workers=os.cpu_count() or 1
+    items=[(d, np.asarray(trans, dtype=float)) for d, trans in items]
+    if workers<=1 or sum(len(d) for d, trans in items)<minSize:
+        results=[flattenChunk(items, thr, minArc)]
+    else:
+        chunks=chunkPaths(items, 4*workers)
+        with ProcessPoolExecutor(workers) as pool:
+            results=list(pool.map(flattenChunk, chunks, [thr]*len(chunks), [minArc]*len(chunks)))
+    coords=np.concatenate([pts for pts, counts in results])
+    counts=[c for pts, cnt in results for c in cnt]
+    return Polyline(coords, np.concatenate(([0], np.cumsum(counts, dtype=np.int64))))
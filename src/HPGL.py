@@ -0,0 +1,85 @@
+import itertools
+import numpy as np
+from Polyline import *
+
+CODES={'PU': 0, 'PD': 1, 'PA': 2, 'PR': 3, 'IN': 4}
+
+def fillState(values, initial):
+    idx=np.where(values>=0, np.arange(len(values)), -1)
+    idx=np.maximum.accumulate(idx) if len(idx) else idx
+    return np.where(idx>=0, values[np.maximum(idx, 0)], initial)
+
+class HPGLReader:
+    def __init__(self):
+        self.pen=0
+        self.relative=0
+        self.pos=np.zeros(2)
+        self.started=False
+        self.points=[]
+        self.pens=[]
+
+    def feed(self, cmds):
+        cmds=[c for c in (c.strip() for c in cmds) if c]
+        if not cmds:
+            return
+        if not self.started:
+            if cmds[0][0:2].upper()!='IN':
+                raise ValueError('Invalid PLT file format')
+            self.started=True
+        codes=np.array([CODES.get(c[0:2].upper(), 5) for c in cmds])
+        nums=[c[2:].replace(',', ' ').split() for c in cmds]
+        counts=np.where(codes<4, [len(n)//2 for n in nums], 0)
+        vals=np.array(list(itertools.chain.from_iterable(n[:k*2] for n, k in zip(nums, counts.tolist()))), dtype=float).reshape(-1,2)
+
+        pen=fillState(np.where(codes==0, 0, np.where(codes==1, 1, np.where(codes==4, 0, -1))), self.pen)
+        relative=fillState(np.where(codes==2, 0, np.where(codes==3, 1, np.where(codes==4, 0, -1))), self.relative)
+        stay=(codes==1)&(counts==0)
+        n=counts+stay
+        cmd=np.repeat(np.arange(len(cmds)), n)
+        isStay=np.repeat(stay, n)
+        xy=np.zeros((len(cmd),2))
+        xy[~isStay]=vals
+        rel=relative[cmd].astype(bool)|isStay
+
+        delta=np.where(rel[:,None], xy, 0.0)
+        cs=np.cumsum(delta, 0)
+        absIdx=np.flatnonzero(~rel)
+        group=np.cumsum(~rel)
+        base=np.concatenate((self.pos[None,:], xy[absIdx]))[group]
+        start=np.concatenate((np.zeros((1,2)), cs[absIdx]))[group]
+        pos=base+cs-start
+
+        self.points.append(pos)
+        self.pens.append(pen[cmd])
+        self.pen=int(pen[-1])
+        self.relative=int(relative[-1])
+        if len(pos):
+            self.pos=pos[-1]
+
+    def read(self, f, chunkSize=1<<20):
+        carry=''
+        for chunk in iter(lambda: f.read(chunkSize), ''):
+            cmds=(carry+chunk).split(';')
+            carry=cmds.pop()
+            self.feed(cmds)
+        self.feed([carry])
+
+    def polyline(self, unit=1.0):
+        pos=np.concatenate(self.points) if self.points else np.zeros((0,2))
+        down=np.concatenate(self.pens).astype(bool) if self.pens else np.zeros(0, dtype=bool)
+        runs=np.flatnonzero(down&~np.concatenate(([False], down[:-1])))
+        prev=np.concatenate((np.zeros((1,2)), pos))[runs]
+        at=np.searchsorted(np.flatnonzero(down), runs)
+        coords=np.insert(pos[down], at, prev, axis=0)
+        offsets=np.append(at+np.arange(len(runs)), len(coords))
+        if len(runs)==0:
+            offsets=[0]
+        return Polyline(np.stack((coords[:,1]/unit, 105.0-coords[:,0]/unit), 1), offsets)
+
+def readHPGL(filename, unit=1.0, chunkSize=1<<20):
+    reader=HPGLReader()
+    with open(filename, errors='replace') as f:
+        reader.read(f, chunkSize)
+    if not reader.started:
+        raise ValueError('Invalid PLT file format')
+    return reader.polyline(unit)
@@ -0,0 +1,78 @@
+import os
+import hashlib
+import numpy as np
+from Polyline import *
+
+class ImportCache:
+    version=1
+
+    def __init__(self, directory=None, maxBytes=256*1024*1024):
+        if directory is None:
+            directory=os.path.join(os.path.expanduser('~'), '.uarmui', 'cache')
+        self.directory=directory
+        self.maxBytes=maxBytes
+
+    def key(self, filename, type, params=()):
+        h=hashlib.sha256()
+        h.update(('%d %s %r\n'%(ImportCache.version, type, tuple(params))).encode())
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1<<20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key+'.npz')
+
+    def load(self, key):
+        path=self.path(key)
+        try:
+            with np.load(path) as data:
+                segs=Polyline(data['coords'], data['offsets'])
+            os.utime(path)
+            return segs
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print('Discarding broken cache entry: '+str(e))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def store(self, key, segs):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp=self.path(key)+'.%d.tmp'%os.getpid()
+            with open(tmp, 'wb') as f:
+                np.savez(f, coords=segs.coords, offsets=segs.offsets)
+            os.replace(tmp, self.path(key))
+            self.evict()
+        except OSError as e:
+            print('Failed to cache import: '+str(e))
+
+    def entries(self):
+        ret=[]
+        if not os.path.isdir(self.directory):
+            return ret
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                st=os.stat(os.path.join(self.directory, name))
+                ret.append((st.st_mtime, st.st_size, name))
+        return sorted(ret)
+
+    def size(self):
+        return sum(size for mtime, size, name in self.entries())
+
+    def evict(self):
+        entries=self.entries()
+        total=sum(size for mtime, size, name in entries)
+        for mtime, size, name in entries:
+            if total<=self.maxBytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total-=size
+
+    def clear(self):
+        for mtime, size, name in self.entries():
+            os.remove(os.path.join(self.directory, name))
@@ -3,7 +3,7 @@ from SnaptoCursor import *
 import numpy as np
 
 class ObjectWidget:
-    def __init__(self, lc, obj, parent, useblit=False):
+    def __init__(self, lc, obj, parent, useblit=True):
         self.parent = parent
         self.ax = self.parent.plt
         self.canvas = self.parent.canvas
@@ -13,8 +13,8 @@ class ObjectWidget:
         self.useblit = useblit
 
         self.connected = False
-        self.background = None
         self.press = None
+        self.pending = None
 
         self.obj.deselectCallback = self.disconnect
         self.obj.selectCallback = self.connect
@@ -27,11 +27,7 @@ class ObjectWidget:
             self.press = self.obj.transform.copy(), SnaptoCursor.mousex, SnaptoCursor.mousey
         else:
             self.press = self.obj.transform.copy(), event.xdata, event.ydata
-        self.lc.set_animated(self.useblit and self.canvas.supports_blit)
-        self.canvas.draw()
-        if self.useblit and self.canvas.supports_blit:
-            self.background = self.canvas.copy_from_bbox(self.ax.bbox)
-        self.redraw()
+        self.parent.scene.beginDrag()
 
     def connect(self):
         'connect to all the events we need'
@@ -44,7 +40,7 @@ class ObjectWidget:
                 'button_release_event', self.on_release)
             self.cidmotion = self.canvas.mpl_connect(
                 'motion_notify_event', self.on_motion)
-        self.canvas.draw()
+        self.parent.scene.update()
 
     def disconnect(self):
         'disconnect all the stored connection ids'
@@ -55,7 +51,7 @@ class ObjectWidget:
             self.canvas.mpl_disconnect(self.cidpress)
             self.canvas.mpl_disconnect(self.cidrelease)
             self.canvas.mpl_disconnect(self.cidmotion)
-        self.canvas.draw()
+        self.parent.scene.update()
 
     def on_motion(self, event):
         if event.inaxes != self.ax: return
@@ -68,23 +64,20 @@ class ObjectWidget:
         else:
             trans[0,2]=transOrig[0,2] + event.xdata - xpress
             trans[1,2]=transOrig[1,2] + event.ydata - ypress
-        self.obj.move(trans)
-        self.redraw()
+        self.pending = trans
+        self.parent.scene.requestFrame()
+
+    def flush(self):
+        if self.pending is None or not self.press:
+            return
+        self.obj.move(self.pending)
+        self.pending = None
 
     def on_release(self, event):
+        if not self.press: return
+        self.flush()
         self.press = None
         self.obj.moving = False
-        self.background = None
-        self.lc.set_animated(False)
-        self.canvas.draw()
-
-    def redraw(self):
-        if not self.canvas.widgetlock.available(self):
-            return
-        if self.useblit and self.canvas.supports_blit:
-            if self.background is not None:
-                self.canvas.restore_region(self.background)
-            self.ax.draw_artist(self.lc)
-            self.canvas.blit(self.ax.bbox)
-        else:
-            self.canvas.draw_idle()
+        if self.parent.scene.endDrag():
+            self.parent.updateLOD()
+            self.parent.scene.update()
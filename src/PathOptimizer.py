@@ -0,0 +1,118 @@
+import numpy as np
+from time import time
+
+def dist(A, B):
+    return np.sqrt(((A-B)**2).sum(-1))
+
+def travel(S, E):
+    if len(S)<2:
+        return 0.0
+    return float(dist(E[:-1], S[1:]).sum())
+
+class PathOptimizer:
+    def __init__(self, segs, timeLimit=2.0, maxIter=100000, eps=1e-9):
+        self.segs=segs
+        self.timeLimit=timeLimit
+        self.maxIter=maxIter
+        self.eps=eps
+        self.order=np.arange(len(segs))
+        self.rev=np.zeros(len(segs), dtype=bool)
+        self.S=np.array([seg[0] for seg in segs], dtype=float).reshape(-1,2)
+        self.E=np.array([seg[-1] for seg in segs], dtype=float).reshape(-1,2)
+        self.iterations=0
+        self.saved=0.0
+
+    def reverse(self, i, j):
+        S=self.S[i:j+1][::-1].copy()
+        self.S[i:j+1]=self.E[i:j+1][::-1]
+        self.E[i:j+1]=S
+        self.order[i:j+1]=self.order[i:j+1][::-1].copy()
+        self.rev[i:j+1]=~self.rev[i:j+1][::-1]
+
+    def twoOpt(self, i):
+        n=len(self.S)
+        S, E = self.S, self.E
+        j=np.arange(i, n)
+        right=np.zeros(len(j))
+        newRight=np.zeros(len(j))
+        inner=j<n-1
+        right[inner]=dist(E[j[inner]], S[j[inner]+1])
+        newRight[inner]=dist(S[i], S[j[inner]+1])
+        if i>0:
+            delta=dist(E[i-1], E[j])+newRight-dist(E[i-1], S[i])-right
+        else:
+            delta=newRight-right
+        k=np.argmin(delta)
+        if delta[k]< -self.eps:
+            self.reverse(i, j[k])
+            return -delta[k]
+        return 0.0
+
+    def orOpt(self, i, L):
+        n=len(self.S)
+        if i+L>n or L>=n:
+            return 0.0
+        S, E = self.S, self.E
+        a, b = S[i], E[i+L-1]
+        removed=0.0
+        if i>0:
+            removed+=dist(E[i-1], a)
+        if i+L<n:
+            removed+=dist(b, S[i+L])
+        if i>0 and i+L<n:
+            removed-=dist(E[i-1], S[i+L])
+        keep=np.concatenate((np.arange(0, i), np.arange(i+L, n)))
+        KS, KE = S[keep], E[keep]
+        m=len(keep)
+        best=(0.0, None, False)
+        for flip in (False, True):
+            first, last = (b, a) if flip else (a, b)
+            p=np.arange(-1, m)
+            added=np.zeros(m+1)
+            added[1:]+=dist(KE, first)
+            added[:-1]+=dist(last, KS)
+            added[1:-1]-=dist(KE[:-1], KS[1:])
+            added[i]=np.inf
+            delta=added-removed
+            k=np.argmin(delta)
+            if delta[k]<best[0]-self.eps:
+                best=(delta[k], p[k], flip)
+        if best[1] is None:
+            return 0.0
+        delta, p, flip = best
+        block=np.arange(i, i+L)
+        if flip:
+            block=block[::-1]
+        pos=np.concatenate((keep[:p+1], block, keep[p+1:]))
+        self.S, self.E = S[pos], E[pos]
+        self.order, self.rev = self.order[pos], self.rev[pos]
+        if flip:
+            sel=slice(p+1, p+1+L)
+            self.S[sel], self.E[sel] = self.E[sel].copy(), self.S[sel].copy()
+            self.rev[sel]=~self.rev[sel]
+        return -delta
+
+    def run(self):
+        start=time()
+        before=travel(self.S, self.E)
+        improved=True
+        while improved:
+            improved=False
+            for move in [lambda i: self.twoOpt(i)]+[lambda i, L=L: self.orOpt(i, L) for L in (1, 2, 3)]:
+                for i in range(len(self.S)):
+                    if time()-start>self.timeLimit or self.iterations>=self.maxIter:
+                        self.saved=before-travel(self.S, self.E)
+                        return self.saved
+                    if move(i)>0.0:
+                        self.iterations+=1
+                        improved=True
+        self.saved=before-travel(self.S, self.E)
+        return self.saved
+
+    def result(self):
+        return [self.segs[i][::-1] if r else self.segs[i] for i, r in zip(self.order, self.rev)]
+
+def optimizePath(segs, timeLimit=2.0, maxIter=100000):
+    opt=PathOptimizer(segs, timeLimit, maxIter)
+    saved=opt.run()
+    return opt.result(), saved
@@ -0,0 +1,117 @@
+import numpy as np
+
+class Polyline:
+    def __init__(self, coords=None, offsets=None, dtype=np.float64):
+        if coords is None:
+            coords=np.zeros((0,2), dtype=dtype)
+        self.coords=np.asarray(coords, dtype=dtype).reshape(-1,2)
+        if offsets is None:
+            offsets=[0, len(self.coords)] if len(self.coords) else [0]
+        self.offsets=np.asarray(offsets, dtype=np.int64)
+        if self.offsets[0]!=0 or self.offsets[-1]!=len(self.coords) or (np.diff(self.offsets)<0).any():
+            raise ValueError('Invalid polyline offsets!')
+
+    @classmethod
+    def fromSegs(cls, segs, dtype=np.float64):
+        if isinstance(segs, Polyline):
+            return segs
+        arrs=[np.asarray(seg, dtype=dtype).reshape(-1,2) for seg in segs]
+        offsets=np.zeros(len(arrs)+1, dtype=np.int64)
+        offsets[1:]=np.cumsum([len(a) for a in arrs])
+        if not arrs:
+            return cls(dtype=dtype)
+        return cls(np.concatenate(arrs), offsets, dtype)
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Polyline.fromSegs([self[k] for k in range(*i.indices(len(self)))], self.coords.dtype)
+        n=len(self)
+        if i<0:
+            i+=n
+        if i<0 or i>=n:
+            raise IndexError('Polyline index out of range')
+        return self.coords[self.offsets[i]:self.offsets[i+1]]
+
+    def __iter__(self):
+        o=self.offsets
+        for i in range(len(self)):
+            yield self.coords[o[i]:o[i+1]]
+
+    def __eq__(self, other):
+        if not isinstance(other, Polyline):
+            other=Polyline.fromSegs(other)
+        return np.array_equal(self.offsets, other.offsets) and np.array_equal(self.coords, other.coords)
+
+    def __repr__(self):
+        return 'Polyline(%d segments, %d points)'%(len(self), len(self.coords))
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def starts(self):
+        return self.coords[self.offsets[:-1][self.counts()>0]]
+
+    def ends(self):
+        return self.coords[self.offsets[1:][self.counts()>0]-1]
+
+    def edges(self):
+        n=len(self.coords)
+        valid=np.ones(max(n-1,0), dtype=bool)
+        cut=self.offsets[1:-1]-1
+        valid[cut[(cut>=0)&(cut<n-1)]]=False
+        i=np.flatnonzero(valid)
+        single=self.offsets[:-1][self.counts()==1]
+        return np.concatenate((i, single)), np.concatenate((i+1, single))
+
+    def bounds(self):
+        lo=np.full((len(self),2), np.inf)
+        hi=np.full((len(self),2), -np.inf)
+        nz=self.counts()>0
+        if nz.any():
+            starts=self.offsets[:-1][nz]
+            lo[nz]=np.minimum.reduceat(self.coords, starts, axis=0)
+            hi[nz]=np.maximum.reduceat(self.coords, starts, axis=0)
+        return lo, hi
+
+    def decimate(self, tol):
+        n=len(self.coords)
+        if n==0 or tol<=0.0:
+            return self
+        q=np.floor(self.coords/tol)
+        keep=np.ones(n, dtype=bool)
+        keep[1:]=(q[1:]!=q[:-1]).any(1)
+        nz=self.counts()>0
+        keep[self.offsets[:-1][nz]]=True
+        keep[self.offsets[1:][nz]-1]=True
+        csum=np.concatenate(([0], np.cumsum(keep)))
+        return Polyline(self.coords[keep], csum[self.offsets], self.coords.dtype)
+
+    def tolist(self):
+        return [seg.tolist() for seg in self]
+
+    def nbytes(self):
+        return self.coords.nbytes+self.offsets.nbytes
+
+def convexHull(pts):
+    pts=np.asarray(pts, dtype=float).reshape(-1,2)
+    if len(pts)>8:
+        quad=pts[[pts[:,0].argmin(), pts[:,1].argmin(), pts[:,0].argmax(), pts[:,1].argmax()]]
+        inside=np.ones(len(pts), dtype=bool)
+        for a, b in zip(quad, np.roll(quad, -1, 0)):
+            inside&=(b[0]-a[0])*(pts[:,1]-a[1])-(b[1]-a[1])*(pts[:,0]-a[0])>0.0
+        pts=pts[~inside]
+    pts=np.unique(pts, axis=0)
+    if len(pts)<3:
+        return pts
+    def chain(P):
+        ret=[]
+        for p in P:
+            while len(ret)>=2 and (ret[-1][0]-ret[-2][0])*(p[1]-ret[-2][1])-(ret[-1][1]-ret[-2][1])*(p[0]-ret[-2][0])<=0.0:
+                ret.pop()
+            ret.append(p)
+        return ret
+    P=pts.tolist()
+    return np.array(chain(P)[:-1]+chain(P[::-1])[:-1])
@@ -0,0 +1,116 @@
+from matplotlib.backend_bases import DrawEvent
+from time import time
+
+class Scene:
+    def __init__(self, ax, frameTime=0.016):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.artists = {}
+        self.background = None
+        self.notifying = False
+        self.beforeDraw = None
+        self.cid = self.canvas.mpl_connect('draw_event', self.onDraw)
+        self.frameTime = frameTime
+        self.lastFrame = 0.0
+        self.framePending = False
+        self.dragBackground = None
+        self.timer = self.canvas.new_timer(interval=int(frameTime*1000))
+        self.timer.single_shot = True
+        self.timer.add_callback(self.drawFrame)
+
+    def add(self, obj, artist):
+        artist.set_animated(True)
+        self.artists[id(obj)] = (obj, artist)
+
+    def remove(self, obj):
+        obj, artist = self.artists.pop(id(obj))
+        artist.remove()
+        self.update()
+
+    def clear(self):
+        self.artists = {}
+        self.background = None
+        self.dragBackground = None
+
+    def items(self):
+        return list(self.artists.values())
+
+    def onDraw(self, event):
+        if self.notifying:
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.beforeDraw:
+            self.beforeDraw()
+        self.drawObjects()
+
+    def moving(self):
+        return [(obj, artist) for obj, artist in self.artists.values() if obj.moving]
+
+    def drawObjects(self, skip=()):
+        for obj, artist in self.artists.values():
+            if artist not in skip and artist.get_visible():
+                self.ax.draw_artist(artist)
+
+    def capture(self, skip=()):
+        if self.background is None:
+            return None
+        self.canvas.restore_region(self.background)
+        self.drawObjects(skip)
+        return self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def update(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.drawObjects()
+        self.canvas.blit(self.ax.bbox)
+        self.notify()
+
+    def notify(self):
+        self.notifying = True
+        try:
+            self.canvas.callbacks.process('draw_event', DrawEvent('draw_event', self.canvas, self.canvas.get_renderer()))
+        finally:
+            self.notifying = False
+
+    def beginDrag(self):
+        self.dragBackground = None
+        self.requestFrame()
+
+    def endDrag(self):
+        self.timer.stop()
+        self.framePending = False
+        if self.moving():
+            return False
+        self.dragBackground = None
+        return True
+
+    def requestFrame(self):
+        if self.framePending:
+            return
+        self.framePending = True
+        self.timer.interval = max(0, int((self.frameTime-(time()-self.lastFrame))*1000))
+        self.timer.start()
+
+    def drawFrame(self):
+        self.framePending = False
+        items = self.moving()
+        widgets = [getattr(artist, 'objectWidget', None) for obj, artist in items]
+        for widget in widgets:
+            if widget:
+                widget.flush()
+        self.lastFrame = time()
+        if not items or self.canvas.widgetlock.locked():
+            return
+        if self.canvas.supports_blit and self.background is not None and all(w is None or w.useblit for w in widgets):
+            artists = [artist for obj, artist in items]
+            if self.dragBackground is None:
+                self.dragBackground = self.capture(artists)
+            self.canvas.restore_region(self.dragBackground)
+            for artist in artists:
+                self.ax.draw_artist(artist)
+            self.canvas.blit(self.ax.bbox)
+            self.notify()
+        else:
+            self.canvas.draw_idle()
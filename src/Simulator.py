@@ -0,0 +1,154 @@
+import os
+import pty
+import tty
+import math
+import queue
+import select
+import threading
+from time import sleep, time
+from Document import checkCoords
+
+class Simulator:
+    def __init__(self, bufferSize=4, timeScale=1.0, baudrate=115200, latency=0.001):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.timeScale=timeScale
+        self.baudrate=baudrate
+        self.latency=latency
+        self.pos=[140.0, 0.0, 80.0]
+        self.mode=0
+        self.attached=False
+        self.commands=0
+        self.busy=0.0
+        self.started=time()
+        self.rx=queue.Queue(bufferSize)
+        self.writeLock=threading.Lock()
+        self.running=True
+        self.threads=[threading.Thread(target=self.receive, daemon=True),
+                      threading.Thread(target=self.execute, daemon=True)]
+        for t in self.threads:
+            t.start()
+
+    def close(self):
+        self.running=False
+        for t in self.threads:
+            t.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def wait(self, t):
+        if t>0.0 and self.timeScale>0.0:
+            sleep(t*self.timeScale)
+
+    def lineTime(self, line):
+        return self.latency+len(line)*10.0/self.baudrate
+
+    def receive(self):
+        buf=b''
+        while self.running:
+            if not select.select([self.master], [], [], 0.1)[0]:
+                continue
+            try:
+                buf+=os.read(self.master, 1024)
+            except OSError:
+                break
+            while b'\n' in buf:
+                line, buf = buf.split(b'\n', 1)
+                self.wait(self.lineTime(line))
+                line=line.decode(errors='replace').strip()
+                while line and self.running:
+                    try:
+                        self.rx.put(line, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+
+    def execute(self):
+        while self.running:
+            try:
+                line=self.rx.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            seq=None
+            if line.startswith('#'):
+                seq, _, line = line[1:].partition(' ')
+            start=time()
+            out=self.handle(line.split())
+            self.busy+=time()-start
+            self.commands+=1
+            if seq is not None:
+                out='$%s %s'%(seq, out)
+            self.respond(out)
+
+    def respond(self, line):
+        data=(line+'\n').encode()
+        self.wait(self.lineTime(data))
+        with self.writeLock:
+            try:
+                os.write(self.master, data)
+            except OSError:
+                pass
+
+    def handle(self, tokens):
+        if not tokens:
+            return 'E20'
+        cmd=tokens[0]
+        try:
+            params={t[0]: float(t[1:]) for t in tokens[1:]}
+        except (ValueError, IndexError):
+            return 'E21'
+        if cmd=='M17':
+            self.attached=True
+        elif cmd=='M2019':
+            self.attached=False
+        elif cmd=='M204' or cmd=='G2202':
+            pass
+        elif cmd=='M2400':
+            self.mode=int(params.get('S', 0))
+        elif cmd=='P2201':
+            return 'ok VSwiftPro'
+        elif cmd=='P2202':
+            return 'ok V3.1'
+        elif cmd=='P2203':
+            return 'ok V4.0.0'
+        elif cmd=='P2204':
+            return 'ok V4.0.0'
+        elif cmd=='P2400':
+            return 'ok V%d'%self.mode
+        elif cmd=='G0' or cmd=='G1':
+            return self.move(params.get('X', self.pos[0]), params.get('Y', self.pos[1]),
+                             params.get('Z', self.pos[2]), params.get('F', 1000.0))
+        elif cmd=='G2201':
+            s=params.get('S', 0.0)
+            r=math.radians(params.get('R', 90.0))
+            return self.move(s*math.sin(r), -s*math.cos(r), params.get('H', self.pos[2]), params.get('F', 1000.0))
+        elif cmd=='G2004':
+            if 'P' in params:
+                self.wait(params['P']/1000.0)
+            else:
+                self.wait(params.get('X', 0.0)/1000000.0)
+        else:
+            return 'E20'
+        return 'ok'
+
+    def move(self, x, y, z, F):
+        if not checkCoords(x, y, z):
+            return 'E22'
+        d=math.sqrt((x-self.pos[0])**2+(y-self.pos[1])**2+(z-self.pos[2])**2)
+        if F>0.0:
+            self.wait(d/F*60.0)
+        self.pos=[x, y, z]
+        return 'ok'
+
+    def utilization(self):
+        return self.busy/max(time()-self.started, 1e-9)
+
+if __name__ == '__main__':
+    sim=Simulator()
+    print('Simulated uArm on '+sim.port)
+    try:
+        while True:
+            sleep(1.0)
+    except KeyboardInterrupt:
+        sim.close()
@@ -1,5 +1,6 @@
 from matplotlib.widgets import AxesWidget
 import numpy as np
+from SpatialIndex import projectSegments
 
 class SnaptoCursor(AxesWidget):
     mousex = 0.0
@@ -53,39 +54,48 @@ class SnaptoCursor(AxesWidget):
             self.snapToCenters = True
 
 
+    def snapRadius(self, pos):
+        inv=self.ax.transData.inverted()
+        return np.linalg.norm(inv.transform(pos+self.snapDist)-inv.transform(pos))
+
+    def nearest(self, pts, pos):
+        if len(pts)==0:
+            return np.inf, None
+        d=np.linalg.norm(self.ax.transData.transform(pts)-pos, axis=1)
+        i=np.argmin(d)
+        return d[i], pts[i].tolist()
+
+    def nearestOnSegments(self, A, B, pos):
+        if len(A)==0:
+            return np.inf, None
+        t, d = projectSegments(pos, self.ax.transData.transform(A), self.ax.transData.transform(B))
+        i=np.argmin(d)
+        return d[i], (A[i]+t[i]*(B[i]-A[i])).tolist()
+
     def findSnapPoints(self, x, y):
         pos = self.ax.transData.transform(np.array([x, y]))
         minpt=pos
         mindist=np.inf
         if self.snapToCenters:
+            pts=np.array([obj.center for obj in self.doc.objects if not obj.moving]).reshape(-1,2)
+            d, pt = self.nearest(pts, pos)
+            if d<mindist:
+                mindist=d
+                minpt=pt
+        if self.snapToSegEnds or self.snapToSegs:
+            radius=self.snapRadius(pos)
             for obj in self.doc.objects:
                 if obj.moving: continue
-                pt=obj.center
-                d=np.linalg.norm(self.ax.transData.transform(pt)-pos)
-                if d<mindist:
-                    mindist=d
-                    minpt=pt
-        if self.snapToSegEnds:
-            for obj in self.doc.objects:
-                if obj.moving: continue
-                for seg in obj.segs:
-                    pts = [np.array(seg[0]),np.array(seg[-1])]
-                    for pt in pts:
-                        ptt=((obj.transform*np.matrix([[pt[0],pt[1],1]]).transpose())[0:2,0]).transpose().tolist()[0]
-                        d=np.linalg.norm(self.ax.transData.transform(ptt)-pos)
-                        if d<mindist:
-                            mindist=d
-                            minpt=ptt
-        if self.snapToSegs:
-            for obj in self.doc.objects:
-                if obj.moving: continue
-                for seg in obj.segs:
-                    for pta in seg:
-                        pt=((obj.transform*np.matrix([[pta[0],pta[1],1]]).transpose())[0:2,0]).transpose().tolist()[0]
-                        d=np.linalg.norm(self.ax.transData.transform(pt)-pos)
-                        if d<mindist:
-                            mindist=d
-                            minpt=pt
+                if self.snapToSegEnds:
+                    d, pt = self.nearest(obj.snapCandidates(x, y, radius), pos)
+                    if d<mindist:
+                        mindist=d
+                        minpt=pt
+                if self.snapToSegs:
+                    d, pt = self.nearestOnSegments(*obj.snapEdges(x, y, radius), pos)
+                    if d<mindist:
+                        mindist=d
+                        minpt=pt
         if self.snapToOrigin:
             pts = [np.array([0,0]),
                    np.array([125,0]),
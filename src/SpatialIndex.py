@@ -0,0 +1,204 @@
+import math
+import numpy as np
+
+def cellSizeFor(pts, perCell=1.0):
+    if len(pts)==0:
+        return 1.0
+    ext=pts.max(0)-pts.min(0)
+    area=max(ext[0],0.0)*max(ext[1],0.0)
+    if area<=0.0:
+        return max(ext.max()/max(len(pts)/perCell,1.0), 1e-9) if ext.max()>0.0 else 1.0
+    return math.sqrt(area*perCell/len(pts))
+
+class PointGrid:
+    STRIDE=1<<32
+
+    def __init__(self, pts, cell=None):
+        self.pts=np.asarray(pts, dtype=float).reshape(-1,2)
+        self.xy=self.pts.tolist()
+        self.cell=cell if cell else cellSizeFor(self.pts)
+        self.alive=bytearray(b'\x01')*len(self.pts)
+        self.mask=np.frombuffer(self.alive, dtype=bool) if len(self.pts) else np.zeros(0, dtype=bool)
+        self.count=len(self.pts)
+        self.rings=[[0]]
+        c=np.floor(self.pts/self.cell).astype(np.int64)
+        keys=c[:,0]*PointGrid.STRIDE+c[:,1]
+        self.keys=keys.tolist()
+        order=np.argsort(keys, kind='stable')
+        uniq, first = np.unique(keys[order], return_index=True)
+        ids=order.tolist()
+        bounds=first.tolist()+[len(ids)]
+        self.cells={key: ids[bounds[j]:bounds[j+1]] for j, key in enumerate(uniq.tolist())}
+
+    def remove(self, i):
+        if self.alive[i]:
+            self.alive[i]=0
+            self.count-=1
+            self.cells[self.keys[i]].remove(i)
+
+    def ring(self, r):
+        while len(self.rings)<=r:
+            n=len(self.rings)
+            S=PointGrid.STRIDE
+            ret=[i*S-n for i in range(-n, n+1)]
+            ret+=[i*S+n for i in range(-n, n+1)]
+            ret+=[-n*S+j for j in range(-n+1, n)]
+            ret+=[n*S+j for j in range(-n+1, n)]
+            self.rings.append(ret)
+        return self.rings[r]
+
+    def nearestBrute(self, x, y):
+        ids=np.flatnonzero(self.mask)
+        two=np.full(len(ids), 2.0)
+        d=np.sqrt(np.float_power(x-self.pts[ids,0], two)+np.float_power(y-self.pts[ids,1], two))
+        i=np.argmin(d)
+        return d[i], ids[i]
+
+    def nearest(self, x, y):
+        if self.count==0:
+            return None
+        S=PointGrid.STRIDE
+        fx=x/self.cell
+        fy=y/self.cell
+        cx=int(math.floor(fx))
+        cy=int(math.floor(fy))
+        k=cx*S+cy
+        ox=fx-cx
+        oy=fy-cy
+        c2=self.cell*self.cell*(1.0-1e-6)
+        gl=ox*ox*c2
+        gr=(1.0-ox)*(1.0-ox)*c2
+        gd=oy*oy*c2
+        gu=(1.0-oy)*(1.0-oy)*c2
+        cells=self.cells
+        xy=self.xy
+        best=math.inf
+        cand=[]
+        for dk, g in ((0, 0.0), (-S, gl), (S, gr), (-1, gd), (1, gu),
+                      (-S-1, gl+gd), (-S+1, gl+gu), (S-1, gr+gd), (S+1, gr+gu)):
+            if g>best*(1.0+1e-9):
+                continue
+            ids=cells.get(k+dk)
+            if ids:
+                for i in ids:
+                    px, py = xy[i]
+                    d=(x-px)*(x-px)+(y-py)*(y-py)
+                    if d<=best*(1.0+1e-9):
+                        cand.append((d, i))
+                        if d<best:
+                            best=d
+        margin=min(ox, 1.0-ox, oy, 1.0-oy)*self.cell
+        r=1
+        while True:
+            lim=r*self.cell+margin
+            if cand and best*(1.0+1e-6)<lim*lim:
+                break
+            r+=1
+            if (2*r+1)*(2*r+1)>4*self.count+16:
+                return self.nearestBrute(x, y)
+            for dk in self.ring(r):
+                ids=cells.get(k+dk)
+                if ids:
+                    for i in ids:
+                        px, py = xy[i]
+                        d=(x-px)*(x-px)+(y-py)*(y-py)
+                        if d<=best*(1.0+1e-9):
+                            cand.append((d, i))
+                            if d<best:
+                                best=d
+        ret=(math.inf, -1)
+        for d, i in cand:
+            if d<=best*(1.0+1e-9):
+                px, py = xy[i]
+                d=math.sqrt(math.pow(x-px,2)+math.pow(y-py,2))
+                if (d, i)<ret:
+                    ret=(d, i)
+        return ret
+
+    def queryRadius(self, x, y, radius):
+        x0=int(math.floor((x-radius)/self.cell))
+        x1=int(math.floor((x+radius)/self.cell))
+        y0=int(math.floor((y-radius)/self.cell))
+        y1=int(math.floor((y+radius)/self.cell))
+        if (x1-x0+1)*(y1-y0+1)>len(self.pts):
+            d=(self.pts[:,0]-x)*(self.pts[:,0]-x)+(self.pts[:,1]-y)*(self.pts[:,1]-y)
+            return np.flatnonzero(self.mask&(d<=radius*radius)).tolist()
+        ret=[]
+        for cx in range(x0, x1+1):
+            for cy in range(y0, y1+1):
+                for i in self.cells.get(cx*PointGrid.STRIDE+cy, ()):
+                    px, py = self.xy[i]
+                    if (x-px)*(x-px)+(y-py)*(y-py)<=radius*radius:
+                        ret.append(i)
+        return ret
+
+def projectSegments(p, A, B):
+    D=B-A
+    L=(D*D).sum(1)
+    t=np.clip(((p-A)*D).sum(1)/np.where(L>0.0, L, 1.0), 0.0, 1.0)
+    Q=A+t[:,None]*D
+    return t, np.sqrt(((Q-p)**2).sum(1))
+
+def gridCrossings(A, D, c0, c1, cell, axis):
+    n=c1[:,axis]-c0[:,axis]
+    e=np.repeat(np.arange(len(n)), n)
+    k=c0[e,axis]+1+np.arange(len(e))-np.repeat(np.cumsum(n)-n, n)
+    t=(k*cell-A[e,axis])/D[e,axis]
+    other=np.floor((A[e,1-axis]+t*D[e,1-axis])/cell).astype(np.int64)
+    other=np.clip(other, c0[e,1-axis], c1[e,1-axis])
+    cells=np.empty((2*len(e),2), dtype=np.int64)
+    cells[0::2,axis]=k-1
+    cells[1::2,axis]=k
+    cells[:,1-axis]=np.repeat(other, 2)
+    return np.repeat(e, 2), cells
+
+def edgeCells(A, B, cell):
+    lo=np.minimum(A, B)
+    hi=np.maximum(A, B)
+    c0=np.floor(lo/cell).astype(np.int64)
+    c1=np.floor(hi/cell).astype(np.int64)
+    ids=np.arange(len(A))
+    ex, cx = gridCrossings(A, B-A, c0, c1, cell, 0)
+    ey, cy = gridCrossings(A, B-A, c0, c1, cell, 1)
+    edges=np.concatenate((ids, ids, ex, ey))
+    cells=np.concatenate((np.floor(A/cell).astype(np.int64), np.floor(B/cell).astype(np.int64), cx, cy))
+    return edges, cells[:,0]*PointGrid.STRIDE+cells[:,1]
+
+class SegmentGrid:
+    def __init__(self, A, B, cell=None):
+        self.A=np.asarray(A, dtype=float).reshape(-1,2)
+        self.B=np.asarray(B, dtype=float).reshape(-1,2)
+        lo=np.minimum(self.A, self.B)
+        hi=np.maximum(self.A, self.B)
+        if cell is None:
+            cell=max(cellSizeFor(np.concatenate((self.A, self.B))), float((hi-lo).max(1).mean()) if len(lo) else 0.0)
+        self.cell=cell
+        edges, keys = edgeCells(self.A, self.B, cell)
+        order=np.lexsort((edges, keys))
+        edges=edges[order]
+        keys=keys[order]
+        keep=np.ones(len(keys), dtype=bool)
+        keep[1:]=(keys[1:]!=keys[:-1])|(edges[1:]!=edges[:-1])
+        self.edges=edges[keep]
+        keys, first, n = np.unique(keys[keep], return_index=True, return_counts=True)
+        self.cells=dict(zip(keys.tolist(), zip(first.tolist(), (first+n).tolist())))
+
+    def queryRadius(self, x, y, radius):
+        x0=int(math.floor((x-radius)/self.cell))
+        x1=int(math.floor((x+radius)/self.cell))
+        y0=int(math.floor((y-radius)/self.cell))
+        y1=int(math.floor((y+radius)/self.cell))
+        if (x1-x0+1)*(y1-y0+1)>len(self.A):
+            ids=np.arange(len(self.A))
+        else:
+            parts=[]
+            for cx in range(x0, x1+1):
+                for cy in range(y0, y1+1):
+                    span=self.cells.get(cx*PointGrid.STRIDE+cy)
+                    if span:
+                        parts.append(self.edges[span[0]:span[1]])
+            if not parts:
+                return parts
+            ids=np.unique(np.concatenate(parts))
+        t, d = projectSegments(np.array([x, y]), self.A[ids], self.B[ids])
+        return ids[d<=radius].tolist()
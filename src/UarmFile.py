@@ -0,0 +1,55 @@
+import os
+import json
+import struct
+import numpy as np
+
+MAGIC=b'UARMBIN\x00'
+VERSION=1
+ALIGN=64
+FIXED=struct.Struct('<III')
+
+def aligned(n):
+    return (n+ALIGN-1)//ALIGN*ALIGN
+
+def isContainer(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC))==MAGIC
+
+def writeContainer(filename, header, arrays):
+    layout={}
+    pos=0
+    data=[]
+    for name, arr in arrays.items():
+        arr=np.ascontiguousarray(arr, dtype=np.dtype(arr.dtype).newbyteorder('<'))
+        layout[name]={'offset': pos, 'shape': list(arr.shape), 'dtype': arr.dtype.str}
+        data.append((pos, arr))
+        pos=aligned(pos+arr.nbytes)
+    header=dict(header, arrays=layout)
+    text=json.dumps(header).encode()
+    start=aligned(len(MAGIC)+FIXED.size+len(text))
+    tmp=filename+'.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(FIXED.pack(VERSION, len(text), start))
+        f.write(text)
+        for offset, arr in data:
+            f.seek(start+offset)
+            f.write(arr.tobytes())
+        f.truncate(start+pos)
+    os.replace(tmp, filename)
+
+def readHeader(filename):
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC))!=MAGIC:
+            raise ValueError('Not a binary uArm file')
+        version, length, start = FIXED.unpack(f.read(FIXED.size))
+        if version>VERSION:
+            raise ValueError('Unsupported uArm file version %d'%version)
+        header=json.loads(f.read(length).decode())
+    return header, start
+
+def mapArray(filename, start, entry):
+    shape=tuple(entry['shape'])
+    if np.prod(shape)==0:
+        return np.zeros(shape, dtype=entry['dtype'])
+    return np.memmap(filename, dtype=entry['dtype'], mode='r', offset=start+entry['offset'], shape=shape)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import pytest
+from Document import *
+from Simulator import Simulator
+
+Document.importCache=None
+
+@pytest.fixture
+def sim():
+    s=Simulator(timeScale=0)
+    yield s
+    s.close()
@@ -0,0 +1,89 @@
+import os
+import pty
+import threading
+from time import time
+from Device import *
+
+class Commands:
+    def __init__(self, n, hook=None):
+        self.n=n
+        self.hook=hook
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for i in range(self.n):
+            if self.hook:
+                self.hook(i)
+            yield gCodeMove(150+i%50, i%20, 90, 1000)
+
+def plot(dev, g):
+    done=[]
+    dev.plot(g, lambda: done.append(True))
+    return done
+
+def test_plot_completes(sim):
+    dev=Device(sim.port)
+    assert dev.isConnected()
+    before=sim.commands
+    done=plot(dev, Commands(200))
+    assert done and not dev.running and dev.error is None
+    assert dev.progress==100.0
+    assert sim.commands-before>=201
+    assert not dev.pending
+    dev.disconnect()
+
+def test_pause_resumes(sim):
+    dev=Device(sim.port)
+    def hook(i):
+        if i==20:
+            dev.pause=True
+            threading.Timer(0.2, lambda: setattr(dev, 'pause', False)).start()
+    done=plot(dev, Commands(60, hook))
+    assert done and dev.error is None
+    assert dev.progress==100.0
+    dev.disconnect()
+
+def test_stop_aborts(sim):
+    dev=Device(sim.port)
+    def hook(i):
+        if i==20:
+            dev.stop=True
+    done=plot(dev, Commands(60, hook))
+    assert done and not dev.running
+    assert dev.progress<100.0
+    assert sim.pos==[160.0, 0.0, 100.0]
+    dev.disconnect()
+
+def test_unreachable_aborts(sim):
+    dev=Device(sim.port)
+    g=[gCodeMove(150, 0, 90, 1000)]*10+[gCodeMove(10, 0, 90, 1000)]+[gCodeMove(150, 0, 90, 1000)]*10
+    done=plot(dev, g)
+    assert done and not dev.running
+    assert dev.error.startswith('Position is unreachable')
+    assert dev.progress<100.0
+    assert sim.pos==[160.0, 0.0, 100.0]
+    dev.disconnect()
+
+def test_generator_error_aborts(sim):
+    dev=Device(sim.port)
+    def hook(i):
+        if i==10:
+            raise RuntimeError('boom')
+    done=plot(dev, Commands(60, hook))
+    assert done and not dev.running
+    assert dev.error=='Failed to generate G-code:\nboom'
+    assert not dev.pending
+    dev.disconnect()
+
+def test_silent_port_is_released():
+    master, slave = pty.openpty()
+    start=time()
+    dev=Device(os.ttyname(slave), timeout=0.2)
+    assert not dev.isConnected()
+    assert time()-start<3.0
+    assert not dev.reader.is_alive()
+    assert not dev.ser.is_open
+    os.close(master)
+    os.close(slave)
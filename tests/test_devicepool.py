@@ -0,0 +1,79 @@
+import numpy as np
+from DevicePool import *
+from Document import *
+from Simulator import Simulator
+
+def makeDoc(segs, mode=1):
+    doc=Document()
+    doc.mode=mode
+    obj=DocumentObject()
+    obj.segs=Polyline.fromSegs([np.array(s, dtype=float) for s in segs])
+    obj.updateBoundingBox()
+    doc.objects.append(obj)
+    return doc
+
+class Recording(Device):
+    def __init__(self, port):
+        self.plots=[]
+        Device.__init__(self, port)
+
+    def plot(self, g, callback):
+        self.plots.append([])
+        Device.plot(self, g, callback)
+
+    def send(self, cmd):
+        if self.plots and self.running:
+            self.plots[-1].append(cmd)
+        return Device.send(self, cmd)
+
+class Offline:
+    def __init__(self, port):
+        pass
+
+    def isConnected(self):
+        return False
+
+def test_jobs_finish(sim):
+    pool=DevicePool([sim.port])
+    jobs=[pool.submit(makeDoc([[[150, 0], [160, 10], [170, 0]], [[200, 50], [210, 60]]], mode), str(mode)) for mode in (1, 3)]
+    pool.wait()
+    assert [job.state for job in jobs]==['done', 'done']
+    assert [job.progress for job in jobs]==[100.0, 100.0]
+    assert pool.jobsPerHour()>0.0
+    pool.shutdown()
+
+def test_unreachable_job_fails(sim):
+    pool=DevicePool([sim.port])
+    bad=pool.submit(makeDoc([[[150, 0], [10, 0]]]), 'bad')
+    good=pool.submit(makeDoc([[[150, 0], [160, 0]]]), 'good')
+    pool.wait()
+    assert bad.state=='failed' and bad.progress==0.0
+    assert good.state=='done'
+    pool.shutdown()
+
+def test_no_device_fails_jobs():
+    pool=DevicePool(['a', 'b'], Offline)
+    job=pool.submit(makeDoc([[[150, 0], [160, 0]]]))
+    pool.wait(0.01)
+    assert job.state=='failed'
+    assert job.error=='No device available'
+    pool.shutdown()
+
+def test_same_doc_on_two_devices():
+    sims=[Simulator(timeScale=0) for i in range(2)]
+    rng=np.random.default_rng(3)
+    segs=[rng.random((k,2))*[100,300]+[150,-150] for k in rng.integers(2, 8, 200)]
+    segs+=[segs[i][::-1][:2] for i in range(0, 200, 7)]
+    doc=makeDoc(segs)
+    expected=list(doc.gcodeStream())
+    pool=DevicePool([s.port for s in sims], Recording)
+    jobs=[pool.submit(doc, str(i)) for i in range(4)]
+    pool.wait()
+    assert [job.state for job in jobs]==['done']*4
+    plots=[p for dev in pool.devices.values() for p in dev.plots]
+    assert len(plots)==4
+    assert all(p[1:]==expected for p in plots)
+    assert list(doc.gcodeStream())==expected
+    pool.shutdown()
+    for s in sims:
+        s.close()
@@ -0,0 +1,143 @@
+import math
+import numpy as np
+import pytest
+from Document import *
+
+def refDistance(A, B):
+    return math.sqrt(math.pow(A[0]-B[0],2) + math.pow(A[1]-B[1],2))
+
+def refGcode(doc, segs):
+    ret=[]
+    z=doc.height+doc.zoffset
+    for seg in segs:
+        v=seg[0]
+        if doc.mode == 1:
+            ret.append(gCodeMove(v[0], v[1], z, doc.F0))
+            ret.append(gCodeDelay(1000000))
+            ret.append(gCodeMove(v[0], v[1], z, doc.F/2.0))
+            for v in seg[1:]:
+                ret.append(gCodeBurn(v[0], v[1], z, doc.F))
+            v=seg[-1]
+            ret.append(gCodeMove(v[0], v[1], z, doc.F))
+            ret.append(gCodeDelay(500000))
+        else:
+            ret.append(gCodeMove(v[0], v[1], z+doc.lift, doc.F0))
+            ret.append(gCodeMove(v[0], v[1], z, doc.F0))
+            for v in seg[1:]:
+                ret.append(gCodeMove(v[0], v[1], z, doc.F))
+            v=seg[-1]
+            ret.append(gCodeMove(v[0], v[1], z+doc.lift, doc.F0))
+    if doc.mode == 1:
+        v=segs[-1][0]
+        ret.append(gCodeMove(v[0], v[1], z, doc.F0))
+    return ret
+
+def refGreedy(segs):
+    lens=[sum(refDistance(s[i-1], s[i]) for i in range(1, len(s))) for s in segs]
+    cur=max(range(len(segs)), key=lambda i: (lens[i], -i))
+    toCheck=list(range(len(segs)))
+    ret=[]
+    while True:
+        toCheck.remove(cur)
+        ret.append(cur)
+        if not toCheck:
+            break
+        p=segs[cur][-1]
+        dmin=np.inf
+        for i in toCheck:
+            d1=refDistance(p, segs[i][0])
+            d2=refDistance(p, segs[i][-1])
+            if d1<dmin:
+                dmin, cur, rev = d1, i, False
+            if d2<dmin:
+                dmin, cur, rev = d2, i, True
+        if rev:
+            segs[cur]=segs[cur][::-1]
+    return ret
+
+def randomSegs(seed, n, scale=(100, 300), offset=(150, -150)):
+    rng=np.random.default_rng(seed)
+    return [rng.random((k,2))*scale+offset for k in rng.integers(1, 40, n)]
+
+@pytest.mark.parametrize('mode', [1, 3])
+def test_gcode_matches_reference(mode):
+    doc=Document()
+    doc.mode=mode
+    doc.height=2.5
+    doc.F=137.5
+    doc.segs=randomSegs(mode, 500)
+    doc.updateGcodeBurn() if mode == 1 else doc.updateGcodeDraw()
+    assert doc.gcode==refGcode(doc, doc.segs)
+
+def test_gcode_rejects_unreachable():
+    doc=Document()
+    doc.segs=randomSegs(0, 20)
+    doc.segs[3][1]=[10.0, 0.0]
+    with pytest.raises(ValueError):
+        doc.updateGcodeBurn()
+
+@pytest.mark.parametrize('seed, grid', [(0, True), (1, False), (2, True), (3, False)])
+def test_greedy_matches_reference(seed, grid):
+    rng=np.random.default_rng(seed)
+    if grid:
+        segs=[rng.integers(0, 20, (k,2))*1.0 for k in rng.integers(1, 5, 400)]
+    else:
+        segs=[rng.random((k,2))*100 for k in rng.integers(1, 5, 400)]
+    ref=[s.copy() for s in segs]
+    expected=refGreedy(ref)
+    doc=Document()
+    doc.segs=segs
+    assert doc.sortGreedy()==expected
+    assert all(np.array_equal(a, b) for a, b in zip(doc.segs, ref))
+
+def test_interleaved_streams():
+    doc=Document()
+    obj=DocumentObject()
+    segs=randomSegs(4, 300)
+    segs+=[segs[i][::-1][:2] for i in range(0, 300, 7)]
+    obj.segs=Polyline.fromSegs(segs)
+    obj.updateBoundingBox()
+    doc.objects.append(obj)
+    expected=list(doc.gcodeStream())
+    g1=iter(doc.gcodeStream())
+    a=[next(g1) for i in range(500)]
+    g2=doc.gcodeStream()
+    len(g2)
+    g2=iter(g2)
+    b=[next(g2) for i in range(500)]
+    a+=list(g1)
+    b+=list(g2)
+    assert a==expected
+    assert b==expected
+
+def joined(segs, tol=0.0):
+    doc=Document()
+    doc.joinTol=tol
+    doc.segs=[np.array(s, dtype=float) for s in segs]
+    doc.joinSegs()
+    return [s.tolist() for s in doc.segs]
+
+def test_join_forward_chain():
+    chain=[[[0, 0], [1, 0]], [[1, 0], [2, 0]], [[2, 0], [3, 0]]]
+    expected=[[[0, 0], [1, 0], [2, 0], [3, 0]]]
+    assert joined(chain)==expected
+    assert joined(chain[2:]+chain[:2])==expected
+
+def test_join_reversed():
+    assert joined([[[0, 0], [1, 0]], [[2, 0], [1, 0]]])==[[[0, 0], [1, 0], [2, 0]]]
+    assert joined([[[1, 0], [0, 0]], [[1, 0], [2, 0]]])==[[[2, 0], [1, 0], [0, 0]]]
+
+def test_join_closed_loop():
+    square=[[[0, 0], [1, 0]], [[1, 0], [1, 1]], [[1, 1], [0, 1]], [[0, 1], [0, 0]]]
+    assert joined(square)==[[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
+    loop=[[[0, 0], [1, 0], [1, 1], [0, 0]], [[5, 5], [6, 6]]]
+    assert joined(loop)==loop
+
+def test_join_tolerance():
+    segs=[[[0, 0], [1, 0]], [[1.05, 0], [2, 0]]]
+    assert joined(segs)==segs
+    assert joined(segs, 0.1)==[[[0, 0], [1, 0], [2, 0]]]
+
+def test_join_branch_prefers_forward_lowest_index():
+    segs=[[[0, 0], [1, 0]], [[1, 0], [2, 0]], [[1, 0], [1, 1]]]
+    assert joined(segs)==[[[0, 0], [1, 0], [2, 0]], [[1, 0], [1, 1]]]
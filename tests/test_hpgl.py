@@ -0,0 +1,60 @@
+import io
+import numpy as np
+from HPGL import *
+
+def refParse(text, unit):
+    cmds=text.split(';')
+    segs=[]
+    prev=[0,0]
+    for cmd in cmds:
+        if len(cmd)<2:
+            continue
+        c=cmd[0:2]
+        if len(cmd)<=2:
+            v=prev
+        else:
+            vs=cmd[2:].split(',')
+            v=[float(vs[1])/unit, 105.0-float(vs[0])/unit]
+            prev=v
+        if c == 'PU':
+            segs.append([v])
+        elif c == 'PD':
+            segs[-1].append(v)
+    return segs[0:-1]
+
+def parse(text, unit=49.6, chunkSize=1<<20):
+    reader=HPGLReader()
+    reader.read(io.StringIO(text), chunkSize)
+    return reader.polyline(unit)
+
+def randomPlt(seed, n):
+    rng=np.random.default_rng(seed)
+    cmds=['IN']
+    for k in rng.integers(1, 30, n):
+        pts=rng.integers(0, 10000, (k+1,2))
+        cmds.append('PU%d,%d'%tuple(pts[0]))
+        cmds+=['PD%d,%d'%tuple(p) for p in pts[1:]]
+    cmds.append('PU')
+    return ';'.join(cmds)+';'
+
+def test_matches_reference():
+    text=randomPlt(0, 300)
+    poly=parse(text)
+    ref=refParse(text, 49.6)
+    assert len(poly)==len(ref)
+    assert all(np.array_equal(np.asarray(poly[i]), np.array(ref[i])) for i in range(len(ref)))
+
+def test_chunk_boundaries():
+    text=randomPlt(1, 50)
+    assert parse(text, chunkSize=7)==parse(text)
+
+def test_relative_and_multipoint():
+    poly=parse('IN;PU0,0;PR;PD496,0,0,496;PA;PU;', 49.6)
+    assert np.allclose(np.asarray(poly[0]), [[0, 105], [0, 95], [10, 95]])
+
+def test_ignores_non_motion_commands():
+    plain=parse('IN;PU0,0;PD496,0;PD496,496;PU;')
+    assert parse('IN;PU0,0;PD496,0;LT6,1;PD496,496;PU;')==plain
+    assert parse('IN;SP1;PW0.35,1;VS10,1;PU0,0;PD496,0;LT6,1;PD496,496;PU;')==plain
+    relative=parse('IN;PR;PU0,0;PD496,0;VS10,1;PD0,496;PU;')
+    assert relative==plain
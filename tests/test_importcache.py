@@ -0,0 +1,26 @@
+import os
+import numpy as np
+from Document import *
+
+PLT='IN;PU0,0;PD496,0;PD496,496;PU;'
+
+def test_roundtrip(tmp_path):
+    cache=ImportCache(str(tmp_path))
+    segs=Polyline.fromSegs([np.array([[0.0, 1.0], [2.0, 3.0]]), np.array([[4.0, 5.0]])])
+    cache.store('a', segs)
+    assert cache.load('a')==segs
+    assert cache.load('missing') is None
+
+def test_broken_entry_falls_back(tmp_path, monkeypatch):
+    plt=tmp_path/'a.plt'
+    plt.write_text(PLT)
+    cache=ImportCache(str(tmp_path/'cache'))
+    monkeypatch.setattr(Document, 'importCache', cache)
+    expected=Document.load(str(plt)).objects[0].segs
+    path=cache.path(cache.key(str(plt), 'plt', (DocumentObject.pltUnit, )))
+    data=open(path, 'rb').read()
+    for broken in (data[:len(data)//2], b'', b'garbage'):
+        with open(path, 'wb') as f:
+            f.write(broken)
+        assert Document.load(str(plt)).objects[0].segs==expected
+        assert cache.load(cache.key(str(plt), 'plt', (DocumentObject.pltUnit, )))==expected
@@ -0,0 +1,28 @@
+import numpy as np
+from SpatialIndex import *
+
+def bruteEdges(A, B, x, y, radius):
+    t, d = projectSegments(np.array([x, y]), A, B)
+    return np.flatnonzero(d<=radius).tolist()
+
+def test_segment_grid_matches_brute_force():
+    rng=np.random.default_rng(0)
+    A=rng.integers(0, 10, (200,2))*1.0
+    B=np.where(rng.random((200,1))<0.2, A, rng.integers(0, 10, (200,2))*1.0)
+    for cell in (None, 1.0, 0.37):
+        grid=SegmentGrid(A, B, cell)
+        for x, y, r in rng.random((300,3))*[10, 10, 2]:
+            assert sorted(grid.queryRadius(x, y, r))==bruteEdges(A, B, x, y, r)
+
+def test_segment_grid_long_edges():
+    rng=np.random.default_rng(1)
+    A=rng.random((5000,2))*300
+    B=A+rng.normal(0, 0.5, (5000,2))
+    t=np.linspace(0, 300, 50)
+    A=np.concatenate((A, np.stack((t*0, t), 1)))
+    B=np.concatenate((B, np.stack((t*0+300, t+150), 1)))
+    grid=SegmentGrid(A, B)
+    cells=np.abs(B-A).sum(1)/grid.cell+4
+    assert len(grid.edges)<=2*cells.sum()
+    for x, y in rng.random((200,2))*300:
+        assert sorted(grid.queryRadius(x, y, 2.0))==bruteEdges(A, B, x, y, 2.0)
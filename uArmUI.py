@@ -145,9 +145,10 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     def about(self):
         QtWidgets.QMessageBox.about(self, 'About','uArm UI')
 
-qApp = QtWidgets.QApplication(sys.argv)
+if __name__ == '__main__':
+    qApp = QtWidgets.QApplication(sys.argv)
 
-aw = ApplicationWindow()
-aw.setWindowTitle('uArmUI')
-aw.show()
-sys.exit(qApp.exec_())
+    aw = ApplicationWindow()
+    aw.setWindowTitle('uArmUI')
+    aw.show()
+    sys.exit(qApp.exec_())